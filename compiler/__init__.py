@@ -1,3 +1,16 @@
-from .pipeline import compile_source, CompilationResult
+__all__ = [
+    "CompilationResult",
+    "compile_many",
+    "compile_many_threaded",
+    "compile_pipelined",
+    "compile_source",
+]
 
-__all__ = ["compile_source", "CompilationResult"]
+
+def __getattr__(name: str):
+    # Importing the pipeline pulls in every phase; defer it until it is used.
+    if name in __all__:
+        from . import pipeline
+
+        return getattr(pipeline, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 
 from .diagnostics import Span
@@ -23,6 +23,8 @@ class Node:
 @dataclass(frozen=True)
 class Program(Node):
     statements: list[Declaration]
+    # Set when expressions were hash-consed: shared nodes carry no span of their own.
+    span_table: SpanTable | None = field(default=None, compare=False, repr=False)
 
 
 @dataclass(frozen=True)
@@ -56,3 +58,72 @@ class BinaryExpr(Expr):
     op: BinOp
     left: Expr
     right: Expr
+
+
+class SpanTable:
+    # Source spans of hash-consed expression nodes, keyed by node identity. Each
+    # node maps to the spans of all its occurrences, in source order.
+    def __init__(self) -> None:
+        self._spans: dict[int, list[Span | None]] = {}
+
+    def add(self, node: Expr, span: Span | None) -> None:
+        self._spans.setdefault(id(node), []).append(span)
+
+    def spans(self, node: Expr) -> list[Span | None]:
+        return self._spans.get(id(node), [])
+
+
+class Interner:
+    # Builds canonical, span-free expression nodes: structurally identical subtrees
+    # are one object. Children are canonical already, so they are keyed by identity.
+    def __init__(self) -> None:
+        self.spans = SpanTable()
+        self._nodes: dict[tuple, Expr] = {}
+
+    def identifier(self, name: str, span: Span | None) -> Expr:
+        return self._intern(("id", name), lambda: Identifier(name=name), span)
+
+    def literal(self, value: int, span: Span | None) -> Expr:
+        return self._intern(("lit", value), lambda: Literal(value=value), span)
+
+    def binary(self, op: BinOp, left: Expr, right: Expr, span: Span | None) -> Expr:
+        key = (op, id(left), id(right))
+        return self._intern(key, lambda: BinaryExpr(op=op, left=left, right=right), span)
+
+    def _intern(self, key: tuple, make, span: Span | None) -> Expr:
+        node = self._nodes.get(key)
+        if node is None:
+            node = self._nodes[key] = make()
+        self.spans.add(node, span)
+        return node
+
+
+def count_nodes(program: Program) -> int:
+    count = 1
+    stack: list[Node] = list(program.statements)
+    while stack:
+        node = stack.pop()
+        count += 1
+        if isinstance(node, Declaration):
+            stack.append(node.assignment)
+        elif isinstance(node, Assign):
+            stack.append(node.target)
+            stack.append(node.value)
+        elif isinstance(node, BinaryExpr):
+            stack.append(node.left)
+            stack.append(node.right)
+    return count
+
+
+def expression_depth(program: Program) -> int:
+    # Height of the tallest expression tree, found without recursion so that it
+    # is safe on trees the recursive phases could not walk.
+    deepest = 0
+    stack = [(decl.assignment.value, 1) for decl in program.statements]
+    while stack:
+        node, depth = stack.pop()
+        deepest = max(deepest, depth)
+        if isinstance(node, BinaryExpr):
+            stack.append((node.left, depth + 1))
+            stack.append((node.right, depth + 1))
+    return deepest
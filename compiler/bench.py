@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+
+from .cli import render_all
+from .pipeline import compile_many, compile_many_threaded, compile_source
+from .workloads import WORKLOADS, generate
+
+DEFAULT_SIZES = (100, 1000)
+DEFAULT_WORKERS = (1, 2, 4)
+DEFAULT_THRESHOLD = 0.25
+MIN_REGRESSION_SECONDS = 0.002
+STARTUP_COMMANDS = ("lex", "parse", "tac", "all")
+
+
+@dataclass
+class BenchResult:
+    workload: str
+    size: int
+    tokens: int
+    statements: int
+    phases: dict[str, float] = field(default_factory=dict)
+    peak_bytes: int = 0
+
+    @property
+    def compile_seconds(self) -> float:
+        return sum(v for k, v in self.phases.items() if not k.startswith("render_"))
+
+    @property
+    def tokens_per_second(self) -> float:
+        seconds = self.compile_seconds
+        return self.tokens / seconds if seconds else 0.0
+
+    @property
+    def statements_per_second(self) -> float:
+        seconds = self.compile_seconds
+        return self.statements / seconds if seconds else 0.0
+
+    def key(self) -> str:
+        return f"{self.workload}/{self.size}"
+
+
+def run_workload(name: str, size: int, repeat: int = 3) -> BenchResult:
+    source = generate(name, size)
+    best: dict[str, float] = {}
+    counters: dict[str, int] = {}
+    # As in timeit, the collector is paused while timing so that a collection
+    # triggered by earlier allocations is not charged to whichever phase runs next.
+    enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            result = compile_source(source)
+            assert result.metrics is not None
+            timings = {p.name: p.seconds for p in result.metrics.phases}
+            counters = result.metrics.counters
+            for fmt in ("md", "json"):
+                start = time.perf_counter()
+                render_all(result, fmt)
+                timings[f"render_{fmt}"] = time.perf_counter() - start
+            for phase, seconds in timings.items():
+                best[phase] = min(seconds, best.get(phase, seconds))
+    finally:
+        if enabled:
+            gc.enable()
+
+    tracemalloc.start()
+    try:
+        compile_source(source)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return BenchResult(
+        workload=name,
+        size=size,
+        tokens=counters["tokens"],
+        statements=counters["statements"],
+        phases=best,
+        peak_bytes=peak,
+    )
+
+
+@dataclass
+class StartupResult:
+    command: str
+    wall_seconds: float
+    import_us: int
+    modules: list[str] = field(default_factory=list)
+
+
+def measure_startup(command: str, repeat: int = 5) -> StartupResult:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([root, os.environ.get("PYTHONPATH", "")])}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "startup.src")
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write("int a = 1;\n")
+        code = (
+            "import sys; from compiler.cli import main; "
+            f"sys.argv = ['compiler-sim', {command!r}, {path!r}]; main()"
+        )
+        wall = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], env=env, check=True, capture_output=True)
+            wall = min(wall, time.perf_counter() - start)
+        traced = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+
+    import_us = 0
+    modules: list[str] = []
+    for line in traced.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        import_us += int(self_us)
+        name = name.strip()
+        if name.startswith("compiler"):
+            modules.append(name)
+    return StartupResult(command, wall, import_us, modules)
+
+
+def render_startup(results: list[StartupResult]) -> str:
+    rows = [
+        "| Command | Wall (ms) | Imports (ms) | Compiler modules |",
+        "|---|---|---|---|",
+    ]
+    for r in results:
+        rows.append(
+            f"| {r.command} | {r.wall_seconds * 1000:.1f} | {r.import_us / 1000:.1f} | "
+            f"{', '.join(r.modules)} |"
+        )
+    return "\n".join(rows)
+
+
+@dataclass
+class ConcurrencyResult:
+    mode: str
+    workers: int
+    compiles: int
+    seconds: float
+
+    @property
+    def compiles_per_second(self) -> float:
+        return self.compiles / self.seconds if self.seconds else 0.0
+
+
+def measure_concurrency(
+    workload: str = "declarations",
+    size: int = 1000,
+    count: int = 16,
+    workers: tuple[int, ...] = DEFAULT_WORKERS,
+) -> list[ConcurrencyResult]:
+    # The same batch through a thread pool and a process pool at each width; the
+    # process timings include pool start-up and pickling the results back.
+    sources = [generate(workload, size)] * count
+    pools = (("threads", compile_many_threaded), ("processes", compile_many))
+    results: list[ConcurrencyResult] = []
+    for width in workers:
+        for mode, run in pools:
+            start = time.perf_counter()
+            run(sources, workers=width)
+            results.append(ConcurrencyResult(mode, width, count, time.perf_counter() - start))
+    return results
+
+
+def render_concurrency(results: list[ConcurrencyResult]) -> str:
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    rows = [
+        f"GIL {'enabled' if gil else 'disabled'}",
+        "",
+        "| Mode | Workers | Compiles | Seconds | Compiles/s |",
+        "|---|---|---|---|---|",
+    ]
+    for r in results:
+        rows.append(
+            f"| {r.mode} | {r.workers} | {r.compiles} | {r.seconds:.3f} | "
+            f"{r.compiles_per_second:,.1f} |"
+        )
+    return "\n".join(rows)
+
+
+def run_suite(
+    workloads: list[str] | None = None, sizes: tuple[int, ...] = DEFAULT_SIZES, repeat: int = 3
+) -> list[BenchResult]:
+    return [
+        run_workload(name, size, repeat)
+        for name in (workloads or list(WORKLOADS))
+        for size in sizes
+    ]
+
+
+def to_baseline(results: list[BenchResult]) -> dict:
+    return {
+        "python": sys.version.split()[0],
+        "results": {r.key(): asdict(r) for r in results},
+    }
+
+
+def compare(
+    results: list[BenchResult], baseline: dict, threshold: float = DEFAULT_THRESHOLD
+) -> list[str]:
+    regressions: list[str] = []
+    previous = baseline.get("results", {})
+    for result in results:
+        old = previous.get(result.key())
+        if old is None:
+            continue
+        for phase, seconds in result.phases.items():
+            before = old["phases"].get(phase)
+            if before is None or seconds - before < MIN_REGRESSION_SECONDS:
+                continue
+            if seconds > before * (1 + threshold):
+                regressions.append(
+                    f"{result.key()} {phase}: {before * 1000:.2f}ms -> {seconds * 1000:.2f}ms "
+                    f"(+{(seconds / before - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def render_report(results: list[BenchResult]) -> str:
+    rows = [
+        "| Workload | N | Tokens/s | Stmts/s | Peak (KiB) | Phase times (ms) |",
+        "|---|---|---|---|---|---|",
+    ]
+    for r in results:
+        phases = ", ".join(f"{name}={seconds * 1000:.2f}" for name, seconds in r.phases.items())
+        rows.append(
+            f"| {r.workload} | {r.size} | {r.tokens_per_second:,.0f} | "
+            f"{r.statements_per_second:,.0f} | {r.peak_bytes // 1024} | {phases} |"
+        )
+    return "\n".join(rows)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="compiler-bench")
+    parser.add_argument("--workload", action="append", choices=sorted(WORKLOADS))
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: tuple(int(v) for v in value.split(",")),
+        default=DEFAULT_SIZES,
+        help="Comma-separated program sizes",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", help="Write results as a baseline JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument(
+        "--startup", action="store_true", help="Measure CLI startup with -X importtime"
+    )
+    parser.add_argument(
+        "--concurrency",
+        action="store_true",
+        help="Compare thread-pool and process-pool throughput",
+    )
+    parser.add_argument(
+        "--workers",
+        type=lambda value: tuple(int(v) for v in value.split(",")),
+        default=DEFAULT_WORKERS,
+        help="Comma-separated pool sizes for --concurrency",
+    )
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        print(render_startup([measure_startup(cmd, args.repeat) for cmd in STARTUP_COMMANDS]))
+        return 0
+    if args.concurrency:
+        workload = (args.workload or ["declarations"])[0]
+        concurrency = measure_concurrency(workload, args.sizes[-1], workers=args.workers)
+        print(render_concurrency(concurrency))
+        return 0
+
+    results = run_suite(args.workload, args.sizes, args.repeat)
+    print(render_report(results))
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as handle:
+            json.dump(to_baseline(results), handle, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\nRegressions:")
+            print("\n".join(f"- {line}" for line in regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
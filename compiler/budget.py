@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import sys
+import time
+from dataclasses import dataclass
+
+from .diagnostics import Diagnostic, Phase, Span, diag
+
+# Approximate bytes each item keeps alive, measured with tracemalloc on the
+# bundled workloads; the memory budget is checked against this estimate.
+TOKEN_BYTES = 190
+NODE_BYTES = 190
+TAC_BYTES = 150
+ASM_BYTES = 40
+
+# (code, Budget field, BudgetMeter counter, label) of the count budgets.
+_COUNTS = (
+    ("BUD001", "max_bytes", "bytes", "source bytes"),
+    ("BUD002", "max_tokens", "tokens", "tokens"),
+    ("BUD003", "max_nodes", "nodes", "AST nodes"),
+    ("BUD004", "max_tac", "tac", "TAC instructions"),
+    ("BUD005", "max_diagnostics", "diagnostics", "diagnostics"),
+)
+DEADLINE_CODE = "BUD006"
+MEMORY_CODE = "BUD007"
+DEPTH_CODE = "BUD008"
+
+
+@dataclass(frozen=True)
+class Budget:
+    max_bytes: int | None = None
+    max_tokens: int | None = None
+    max_nodes: int | None = None
+    max_tac: int | None = None
+    # Reported diagnostics, suppressed ones included.
+    max_diagnostics: int | None = None
+    # Wall-clock seconds from the start of the compilation.
+    deadline: float | None = None
+    # Estimated bytes held by the source, tokens, AST, TAC and assembly.
+    max_memory: int | None = None
+    # Expression tree height, checked once each slice is parsed. Open parentheses
+    # are capped at this and at depth_ceiling() whether or not it is set.
+    max_depth: int | None = None
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, diagnostic: Diagnostic) -> None:
+        super().__init__(diagnostic.message)
+        self.diagnostic = diagnostic
+
+
+def depth_ceiling() -> int:
+    # The parser recurses several frames per open parenthesis, so a budgeted
+    # compile stops parentheses well before the interpreter's recursion limit.
+    return sys.getrecursionlimit() // 4
+
+
+def too_deep(phase: Phase, span: Span | None = None) -> BudgetExceeded:
+    # Raised in place of a RecursionError from a phase that walks the tree
+    # recursively, e.g. on a long flat `a + a + ...` chain.
+    return BudgetExceeded(diag(phase, DEPTH_CODE, "Expression too deep to compile", span))
+
+
+class BudgetMeter:
+    # Running usage of one compilation. The phases update the counters and call
+    # `check` between statement slices, so a check costs a few comparisons.
+    def __init__(self, budget: Budget) -> None:
+        self.budget = budget
+        self.max_nesting = depth_ceiling()
+        if budget.max_depth is not None:
+            self.max_nesting = min(budget.max_depth, self.max_nesting)
+        self.start = time.monotonic()
+        self.bytes = 0
+        self.tokens = 0
+        self.nodes = 0
+        self.tac = 0
+        self.assembly = 0
+        self.diagnostics = 0
+        self.nesting = 0
+        self.depth = 0
+
+    def memory(self) -> int:
+        return (
+            self.bytes
+            + TOKEN_BYTES * self.tokens
+            + NODE_BYTES * self.nodes
+            + TAC_BYTES * self.tac
+            + ASM_BYTES * self.assembly
+        )
+
+    def check(self, phase: Phase, span: Span | None = None) -> None:
+        budget = self.budget
+        for code, field_name, counter, label in _COUNTS:
+            limit = getattr(budget, field_name)
+            used = getattr(self, counter)
+            if limit is not None and used > limit:
+                self._stop(phase, code, f"Budget of {limit} {label} exceeded ({used})", span)
+        if self.nesting > self.max_nesting:
+            message = f"Parenthesis nesting of {self.max_nesting} levels exceeded ({self.nesting})"
+            self._stop(phase, DEPTH_CODE, message, span)
+        if budget.max_depth is not None and self.depth > budget.max_depth:
+            message = f"Expression depth of {budget.max_depth} levels exceeded ({self.depth})"
+            self._stop(phase, DEPTH_CODE, message, span)
+        if budget.deadline is not None:
+            elapsed = time.monotonic() - self.start
+            if elapsed > budget.deadline:
+                message = f"Deadline of {budget.deadline:g}s exceeded ({elapsed:.3f}s)"
+                self._stop(phase, DEADLINE_CODE, message, span)
+        if budget.max_memory is not None:
+            memory = self.memory()
+            if memory > budget.max_memory:
+                message = f"Memory budget of {budget.max_memory} bytes exceeded (~{memory})"
+                self._stop(phase, MEMORY_CODE, message, span)
+
+    def _stop(self, phase: Phase, code: str, message: str, span: Span | None) -> None:
+        raise BudgetExceeded(diag(phase, code, message, span))
@@ -1,89 +1,415 @@
 from __future__ import annotations
 
 import argparse
-import json
+import mmap
 import sys
+from typing import TYPE_CHECKING
 
-from . import ast
-from .codegen import AssemblyProgram
 from .diagnostics import Diagnostic, Phase
 from .lexer import Token, TokenType, lex
-from .optimizer import OptimizationResult
-from .parser import parse
-from .pipeline import compile_source
-from .semantic import SemanticResult
-from .tac import TACProgram, TACInstr, generate as generate_tac
-from .codegen import generate as generate_asm
-from .optimizer import optimize
+from .metrics import (
+    DEPENDENCIES,
+    OPTIMIZED_CODEGEN,
+    CompilationMetrics,
+    MetricsRecorder,
+    record_counters,
+    record_memo,
+)
+
+if TYPE_CHECKING:
+    from . import ast
+    from .budget import Budget
+    from .codegen import AssemblyProgram, Target
+    from .machine import SimulationComparison, SimulationResult
+    from .memo import ShapeCache
+    from .optimizer import OptimizationResult
+    from .pipeline import CompilationResult
+    from .semantic import SemanticResult
+    from .tac import TACInstr, TACProgram
+    from .visualize import RenderOptions
+
+# Phase modules are imported inside the command branches so that short
+# invocations such as `compiler-sim lex` only pay for the phases they run.
+
+# Budget fields and their flags; `--max-nodes` and `--max-depth` already limit AST
+# rendering.
+_BUDGET_FLAGS = {
+    "max_bytes": ("--max-bytes", int, "N", "Stop if the source is larger than N bytes"),
+    "max_tokens": ("--max-tokens", int, "N", "Stop after more than N tokens"),
+    "max_nodes": ("--max-ast-nodes", int, "N", "Stop after more than N AST nodes"),
+    "max_tac": ("--max-tac", int, "N", "Stop after more than N TAC instructions"),
+    "max_diagnostics": ("--max-diagnostics", int, "N", "Stop after more than N diagnostics"),
+    "deadline": ("--deadline", float, "SECONDS", "Stop after SECONDS of wall-clock time"),
+    "max_memory": ("--max-memory", int, "BYTES", "Stop once estimated memory exceeds BYTES"),
+    "max_depth": ("--max-nesting", int, "N", "Stop at expressions nested deeper than N levels"),
+}
 
 
 def main() -> int:
     parser = argparse.ArgumentParser(prog="compiler-sim")
     sub = parser.add_subparsers(dest="command", required=True)
 
-    for cmd in ["lex", "parse", "semantic", "tac", "codegen", "optimize", "all"]:
+    for cmd in ["lex", "parse", "semantic", "tac", "codegen", "optimize", "simulate", "all"]:
         cmd_parser = sub.add_parser(cmd)
         cmd_parser.add_argument("path", nargs="?", help="Path to source file")
         cmd_parser.add_argument("--stdin", action="store_true", help="Read from stdin")
         cmd_parser.add_argument(
             "--format", choices=["md", "json"], default="md", help="Output format"
         )
+        cmd_parser.add_argument(
+            "--stats", action="store_true", help="Print per-phase timings and counters"
+        )
+        cmd_parser.add_argument(
+            "--profile", action="store_true", help="Run phases under cProfile and tracemalloc"
+        )
+        if cmd != "lex":
+            cmd_parser.add_argument(
+                "--hash-cons",
+                action="store_true",
+                help="Share identical subexpressions in the AST and reuse their TAC temps",
+            )
+        if cmd in ("tac", "codegen", "optimize", "simulate", "all"):
+            cmd_parser.add_argument(
+                "--output",
+                action="append",
+                default=[],
+                metavar="NAME",
+                help="Only compile the declarations this variable depends on",
+            )
+            cmd_parser.add_argument(
+                "--schedule",
+                action="store_true",
+                help="Reorder declarations to keep fewer registers live",
+            )
+            cmd_parser.add_argument(
+                "--memo",
+                type=int,
+                nargs="?",
+                const=0,
+                default=None,
+                metavar="SIZE",
+                help="Reuse TAC templates of repeated statement shapes (LRU of SIZE, default 1024)",
+            )
+        if cmd in ("codegen", "optimize", "simulate", "all"):
+            cmd_parser.add_argument(
+                "--target",
+                choices=["accumulator", "risc", "stack"],
+                default="accumulator",
+                help="Machine model to generate code for",
+            )
+        if cmd in ("semantic", "simulate", "all"):
+            _add_budget_arguments(cmd_parser)
+        if cmd in ("simulate", "all"):
+            cmd_parser.add_argument(
+                "--pipeline",
+                action="store_true",
+                help="Run the phases concurrently, connected by bounded queues",
+            )
+        if cmd in ("parse", "all"):
+            _add_ast_arguments(cmd_parser)
+        if cmd == "simulate":
+            cmd_parser.add_argument(
+                "--input",
+                action="append",
+                default=[],
+                metavar="NAME=VALUE",
+                help="Initial memory value for a free variable",
+            )
+            cmd_parser.add_argument(
+                "--cycles",
+                action="append",
+                default=[],
+                metavar="OPCODE=N",
+                help="Override the cycle cost of an opcode",
+            )
+            cmd_parser.add_argument(
+                "--compare-targets",
+                action="store_true",
+                help="Also simulate the optimized TAC on every target",
+            )
 
     args = parser.parse_args()
     source = _read_source(args.path, args.stdin)
+    recorder = MetricsRecorder(profile=args.profile)
+    run = recorder.run
+
+    def emit(payload: str | dict, metrics: CompilationMetrics | None = None) -> int:
+        if not (args.stats or args.profile):
+            return _emit(args.format, payload)
+        return _emit(args.format, payload, metrics or recorder.finish())
 
     if args.command == "lex":
-        tokens, diagnostics = lex(source)
-        return _emit(args.format, render_lex(tokens, diagnostics, args.format))
+        tokens, diagnostics = run(Phase.LEXER.value, lex, source)
+        record_counters(recorder, tokens=tokens, diagnostics=diagnostics)
+        return emit(render_lex(tokens, diagnostics, args.format))
     if args.command == "parse":
-        tokens, _ = lex(source)
-        program, diagnostics = parse(tokens)
-        return _emit(args.format, render_parse(program, diagnostics, args.format))
+        from .parser import parse
+
+        tokens, _ = run(Phase.LEXER.value, lex, source)
+        program, diagnostics = run(Phase.PARSER.value, parse, tokens, hash_cons=args.hash_cons)
+        record_counters(recorder, tokens=tokens, program=program, diagnostics=diagnostics)
+        return emit(
+            render_parse(program, diagnostics, args.format, args.ast_format, _ast_options(args))
+        )
     if args.command == "semantic":
-        result = compile_source(source)
-        return _emit(args.format, render_semantic(result.semantic, result.diagnostics, args.format))
+        from .pipeline import compile_source
+
+        result = compile_source(
+            source, profile=args.profile, hash_cons=args.hash_cons, budget=_budget(args)
+        )
+        _warn_stopped(result)
+        return emit(
+            render_semantic(result.semantic, result.diagnostics, args.format), result.metrics
+        )
     if args.command == "tac":
-        tokens, _ = lex(source)
-        program, _ = parse(tokens)
-        tac = generate_tac(program)
-        return _emit(args.format, render_tac(tac, args.format))
+        from .parser import parse
+
+        tokens, _ = run(Phase.LEXER.value, lex, source)
+        program, _ = run(Phase.PARSER.value, parse, tokens, hash_cons=args.hash_cons)
+        program = _select_declarations(program, args, run)
+        tac = _lower(program, args, recorder)
+        record_counters(recorder, tokens=tokens, program=program, tac=tac)
+        return emit(render_tac(tac, args.format))
     if args.command == "codegen":
-        tokens, _ = lex(source)
-        program, _ = parse(tokens)
-        tac = generate_tac(program)
-        asm = generate_asm(tac)
-        return _emit(args.format, render_codegen(asm, args.format))
+        from .codegen import generate as generate_asm
+        from .parser import parse
+
+        tokens, _ = run(Phase.LEXER.value, lex, source)
+        program, _ = run(Phase.PARSER.value, parse, tokens, hash_cons=args.hash_cons)
+        program = _select_declarations(program, args, run)
+        tac = _lower(program, args, recorder)
+        asm = run(Phase.CODEGEN.value, generate_asm, tac, target=args.target)
+        record_counters(recorder, tokens=tokens, program=program, tac=tac, assembly=asm)
+        return emit(render_codegen(asm, args.format))
     if args.command == "optimize":
-        tokens, _ = lex(source)
-        program, _ = parse(tokens)
-        tac = generate_tac(program)
-        optimized = optimize(tac)
-        asm = generate_asm(optimized.program)
-        return _emit(args.format, render_optimization(optimized, asm, args.format))
+        from .codegen import generate as generate_asm
+        from .optimizer import optimize
+        from .parser import parse
+
+        tokens, _ = run(Phase.LEXER.value, lex, source)
+        program, _ = run(Phase.PARSER.value, parse, tokens, hash_cons=args.hash_cons)
+        program = _select_declarations(program, args, run)
+        tac = _lower(program, args, recorder)
+        optimized = run(Phase.OPTIMIZER.value, optimize, tac)
+        asm = run(OPTIMIZED_CODEGEN, generate_asm, optimized.program, target=args.target)
+        record_counters(
+            recorder,
+            tokens=tokens,
+            program=program,
+            tac=tac,
+            optimized_tac=optimized,
+            optimized_assembly=asm,
+        )
+        return emit(render_optimization(optimized, asm, args.format))
     if args.command == "all":
-        result = compile_source(source)
-        return _emit(args.format, render_all(result, args.format))
+        result = _compile(source, args)
+        return emit(
+            render_all(result, args.format, args.ast_format, _ast_options(args)), result.metrics
+        )
+    if args.command == "simulate":
+        from .machine import DEFAULT_CYCLES, CostModel, compare, compare_targets
+
+        result = _compile(source, args)
+        model = CostModel({**DEFAULT_CYCLES, **_assignments(args.cycles)})
+        inputs = _assignments(args.input)
+        try:
+            comparison = compare(result, inputs, model)
+            targets = (
+                compare_targets(result.optimized_tac.program, memory=inputs, model=model)
+                if args.compare_targets
+                else None
+            )
+        except ValueError as exc:
+            raise SystemExit(str(exc)) from exc
+        return emit(render_simulation(comparison, args.format, targets), result.metrics)
 
     return 1
 
 
-def _read_source(path: str | None, use_stdin: bool) -> str:
+def _select_declarations(program: ast.Program, args: argparse.Namespace, run) -> ast.Program:
+    if not (args.output or args.schedule):
+        return program
+    from .depgraph import select
+
+    try:
+        return run(DEPENDENCIES, select, program, args.output or None, args.schedule)
+    except ValueError as exc:
+        raise SystemExit(str(exc)) from exc
+
+
+def _lower(program: ast.Program, args: argparse.Namespace, recorder: MetricsRecorder) -> TACProgram:
+    from .tac import generate as generate_tac
+
+    memo = _memo(args)
+    tac = recorder.run(Phase.TAC.value, generate_tac, program, memo=memo)
+    if memo is not None:
+        record_memo(recorder, None, memo.stats())
+    return tac
+
+
+def _memo(args: argparse.Namespace) -> ShapeCache | None:
+    if args.memo is None:
+        return None
+    from .memo import DEFAULT_MEMO_SIZE, ShapeCache
+
+    return ShapeCache(args.memo or DEFAULT_MEMO_SIZE)
+
+
+def _compile(source: str | bytes | mmap.mmap, args: argparse.Namespace) -> CompilationResult:
+    from .pipeline import compile_pipelined, compile_source
+
+    if args.pipeline:
+        if args.hash_cons or args.output or args.schedule or args.profile or _budget(args):
+            raise SystemExit(
+                "--pipeline cannot be combined with --hash-cons, --output, --schedule, "
+                "--profile or budgets"
+            )
+        return compile_pipelined(source, target=args.target, memo=_memo(args))
+    try:
+        result = compile_source(
+            source,
+            profile=args.profile,
+            hash_cons=args.hash_cons,
+            outputs=args.output or None,
+            schedule=args.schedule,
+            target=args.target,
+            memo=_memo(args),
+            budget=_budget(args),
+        )
+    except ValueError as exc:
+        raise SystemExit(str(exc)) from exc
+    _warn_stopped(result)
+    return result
+
+
+def _warn_stopped(result: CompilationResult) -> None:
+    # Output covers only what was compiled before the budget ran out.
+    stopped = result.stopped
+    if stopped is not None:
+        where = f" (line {stopped.span.line})" if stopped.span is not None else ""
+        print(f"{stopped.code}: {stopped.message}{where}; output is partial", file=sys.stderr)
+
+
+def _budget(args: argparse.Namespace) -> Budget | None:
+    limits = {name: getattr(args, f"budget_{name}", None) for name in _BUDGET_FLAGS}
+    if all(value is None for value in limits.values()):
+        return None
+    from .budget import Budget
+
+    return Budget(**limits)
+
+
+def _add_budget_arguments(cmd_parser: argparse.ArgumentParser) -> None:
+    for name, (flag, kind, metavar, help_text) in _BUDGET_FLAGS.items():
+        cmd_parser.add_argument(
+            flag, dest=f"budget_{name}", type=kind, metavar=metavar, help=help_text
+        )
+
+
+def _assignments(pairs: list[str]) -> dict[str, int]:
+    values: dict[str, int] = {}
+    for pair in pairs:
+        name, sep, value = pair.partition("=")
+        if not sep or not value.lstrip("-").isdigit():
+            raise SystemExit(f"Expected NAME=INTEGER, got '{pair}'")
+        values[name] = int(value)
+    return values
+
+
+def _add_ast_arguments(cmd_parser: argparse.ArgumentParser) -> None:
+    cmd_parser.add_argument(
+        "--ast-format",
+        choices=["mermaid", "dot", "text"],
+        default="mermaid",
+        help="AST diagram format",
+    )
+    cmd_parser.add_argument("--max-depth", type=int, default=None, help="Elide deeper AST nodes")
+    cmd_parser.add_argument(
+        "--max-nodes", type=int, default=500, help="Elide AST nodes beyond this count"
+    )
+    cmd_parser.add_argument(
+        "--dedup", action="store_true", help="Share identical subtrees in the diagram"
+    )
+    cmd_parser.add_argument(
+        "--subgraphs", action="store_true", help="Group each statement in its own subgraph"
+    )
+
+
+def _ast_options(args: argparse.Namespace) -> RenderOptions:
+    from .visualize import RenderOptions
+
+    return RenderOptions(
+        max_depth=args.max_depth,
+        max_nodes=args.max_nodes if args.max_nodes > 0 else None,
+        dedup=args.dedup,
+        subgraphs=args.subgraphs,
+    )
+
+
+def _read_source(path: str | None, use_stdin: bool) -> str | bytes | mmap.mmap:
     if use_stdin:
         return sys.stdin.read()
     if not path:
         raise SystemExit("Provide a source file path or use --stdin.")
-    with open(path, "r", encoding="utf-8") as handle:
-        return handle.read()
-
-
-def _emit(fmt: str, payload: str | dict) -> int:
+    # Files are mapped rather than decoded: the lexer scans the bytes in place, so
+    # memory is not spent on a full str copy of large inputs.
+    with open(path, "rb") as handle:
+        try:
+            return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return ""  # empty files cannot be mapped
+        except OSError:
+            return handle.read()  # pipes, FIFOs and devices cannot be mapped either
+
+
+def _emit(fmt: str, payload: str | dict, metrics: CompilationMetrics | None = None) -> int:
+    if metrics is not None:
+        stats = render_metrics(metrics, fmt)
+        if fmt == "json":
+            payload = {**payload, "metrics": stats}  # type: ignore[dict-item]
+        else:
+            payload = f"{payload}\n\n{stats}"
     if fmt == "json":
+        import json
+
         print(json.dumps(payload, indent=2, ensure_ascii=False))
     else:
         print(payload)
     return 0
 
 
+def render_metrics(metrics: CompilationMetrics, fmt: str) -> str | dict:
+    if fmt == "json":
+        return {
+            "phases": [
+                {
+                    "name": p.name,
+                    "seconds": p.seconds,
+                    "allocated_blocks": p.allocated_blocks,
+                    "peak_bytes": p.peak_bytes,
+                }
+                for p in metrics.phases
+            ],
+            "counters": metrics.counters,
+            "profile": metrics.profile,
+        }
+    rows = [
+        "## Metricas de compilacion",
+        "",
+        "| Fase | Tiempo (ms) | Bloques asignados | Pico (bytes) |",
+        "|---|---|---|---|",
+    ]
+    for p in metrics.phases:
+        peak = p.peak_bytes if p.peak_bytes is not None else "-"
+        rows.append(f"| {p.name} | {p.seconds * 1000:.3f} | {p.allocated_blocks} | {peak} |")
+    rows.append(f"| total | {metrics.total_seconds * 1000:.3f} | - | - |")
+    rows.extend(["", "| Contador | Valor |", "|---|---|"])
+    rows.extend(f"| {name} | {value} |" for name, value in metrics.counters.items())
+    if metrics.profile:
+        rows.extend(["", "### Perfil (cProfile):", "```", metrics.profile, "```"])
+    return "\n".join(rows)
+
+
 def render_lex(tokens: list[Token], diagnostics: list[Diagnostic], fmt: str) -> str | dict:
     if fmt == "json":
         return {
@@ -102,16 +428,27 @@ def render_lex(tokens: list[Token], diagnostics: list[Diagnostic], fmt: str) ->
     ).strip()
 
 
-def render_parse(program: ast.Program, diagnostics: list[Diagnostic], fmt: str) -> str | dict:
+def render_parse(
+    program: ast.Program,
+    diagnostics: list[Diagnostic],
+    fmt: str,
+    ast_format: str = "mermaid",
+    options: RenderOptions | None = None,
+) -> str | dict:
     if fmt == "json":
         return {"ast": _ast_dict(program), "diagnostics": [_diag_dict(d) for d in diagnostics]}
+    from .visualize import render as render_ast
+
+    diagram = render_ast(program, ast_format, options)
+    if ast_format != "mermaid":
+        diagram = f"```{ast_format}\n{diagram}\n```"
     return "\n".join(
         [
             "## Fase 2: Analisis Sintactico (AST)",
             "",
             "### Arbol de sintaxis abstracta:",
             "",
-            _ast_mermaid(program),
+            diagram,
             "",
             _diagnostics_md(diagnostics),
         ]
@@ -163,9 +500,7 @@ def render_codegen(asm: AssemblyProgram, fmt: str) -> str | dict:
     ).strip()
 
 
-def render_optimization(
-    opt: OptimizationResult, asm: AssemblyProgram, fmt: str
-) -> str | dict:
+def render_optimization(opt: OptimizationResult, asm: AssemblyProgram, fmt: str) -> str | dict:
     if fmt == "json":
         return {
             "optimized_tac": [_tac_dict(i) for i in opt.program.instructions],
@@ -186,7 +521,65 @@ def render_optimization(
     ).strip()
 
 
-def render_all(result, fmt: str) -> str | dict:
+def render_simulation(
+    comparison: SimulationComparison,
+    fmt: str,
+    targets: dict[Target, SimulationResult] | None = None,
+) -> str | dict:
+    runs = [("original", comparison.baseline), ("optimizado", comparison.optimized)]
+    if fmt == "json":
+        payload = {
+            "baseline": _simulation_dict(comparison.baseline),
+            "optimized": _simulation_dict(comparison.optimized),
+            "cycles_saved": comparison.cycles_saved,
+            "speedup": comparison.speedup,
+        }
+        if targets is not None:
+            payload["targets"] = {t.value: _simulation_dict(r) for t, r in targets.items()}
+        return payload
+    rows = [
+        "## Simulacion de maquina",
+        "",
+        "| Programa | Ciclos | Instrucciones | Accesos a memoria | Registros | Max. vivos |",
+        "|---|---|---|---|---|---|",
+    ]
+    for name, run in runs:
+        rows.append(
+            f"| {name} | {run.cycles} | {run.instructions} | {run.memory_accesses} | "
+            f"{run.registers_used} | {run.max_live_registers} |"
+        )
+    rows.extend(
+        [
+            "",
+            f"Ciclos ahorrados: {comparison.cycles_saved} (speedup {comparison.speedup:.2f}x)",
+            "",
+            "### Memoria final:",
+            *(f"- {name} = {value}" for name, value in comparison.optimized.memory.items()),
+        ]
+    )
+    if targets is not None:
+        rows.extend(
+            [
+                "",
+                "### Comparacion de arquitecturas (TAC optimizado):",
+                "| Arquitectura | Ciclos | Instrucciones | Accesos a memoria | Max. vivos |",
+                "|---|---|---|---|---|",
+            ]
+        )
+        for target, run in targets.items():
+            rows.append(
+                f"| {target.value} | {run.cycles} | {run.instructions} | "
+                f"{run.memory_accesses} | {run.max_live_registers} |"
+            )
+    return "\n".join(rows)
+
+
+def render_all(
+    result,
+    fmt: str,
+    ast_format: str = "mermaid",
+    ast_options: RenderOptions | None = None,
+) -> str | dict:
     if fmt == "json":
         return {
             "tokens": [_token_dict(t) for t in result.tokens if t.type != TokenType.EOF],
@@ -201,7 +594,7 @@ def render_all(result, fmt: str) -> str | dict:
         }
     sections = [
         render_lex(result.tokens, result.diagnostics, fmt),
-        render_parse(result.ast, result.diagnostics, fmt),
+        render_parse(result.ast, result.diagnostics, fmt, ast_format, ast_options),
         render_semantic(result.semantic, result.diagnostics, fmt),
         render_tac(result.tac, fmt),
         render_codegen(result.assembly, fmt),
@@ -234,58 +627,17 @@ def _symbol_table(semantic: SemanticResult) -> str:
     return "\n".join(rows)
 
 
-def _ast_mermaid(program: ast.Program) -> str:
-    lines = ["```mermaid", "graph TD"]
-    node_id = 0
-
-    def next_id() -> str:
-        nonlocal node_id
-        node_id += 1
-        return f"N{node_id}"
-
-    def walk(expr: ast.Expr) -> str:
-        if isinstance(expr, ast.Identifier):
-            nid = next_id()
-            lines.append(f"  {nid}[\"Identifier: {expr.name}\"]")
-            return nid
-        if isinstance(expr, ast.Literal):
-            nid = next_id()
-            lines.append(f"  {nid}[\"Literal: {expr.value}\"]")
-            return nid
-        if isinstance(expr, ast.BinaryExpr):
-            nid = next_id()
-            lines.append(f"  {nid}[\"Expr({expr.op.value})\"]")
-            left = walk(expr.left)
-            right = walk(expr.right)
-            lines.append(f"  {nid} --> {left}")
-            lines.append(f"  {nid} --> {right}")
-            return nid
-        raise TypeError(f"Unknown expr {type(expr)}")
-
-    root = next_id()
-    lines.append(f"  {root}[Declaration]")
-    for decl in program.statements:
-        type_node = next_id()
-        assign_node = next_id()
-        lines.append(f"  {type_node}[\"Type: {decl.type_name.value}\"]")
-        lines.append(f"  {assign_node}[Assign]")
-        lines.append(f"  {root} --> {type_node}")
-        lines.append(f"  {root} --> {assign_node}")
-        target = next_id()
-        lines.append(f"  {target}[\"Identifier: {decl.assignment.target.name}\"]")
-        lines.append(f"  {assign_node} --> {target}")
-        expr_id = walk(decl.assignment.value)
-        lines.append(f"  {assign_node} --> {expr_id}")
-    lines.append("```")
-    return "\n".join(lines)
-
-
 def _diagnostics_md(diagnostics: list[Diagnostic]) -> str:
     if not diagnostics:
         return "Sin errores."
     lines = ["### Diagnosticos:"]
     for diag in diagnostics:
-        if diag.span:
+        if diag.span and diag.end:
+            loc = (
+                f"(linea {diag.span.line}, col {diag.span.col} - "
+                f"linea {diag.end.line}, col {diag.end.col}; {diag.count} ocurrencias)"
+            )
+        elif diag.span:
             loc = f"(linea {diag.span.line}, col {diag.span.col})"
         else:
             loc = ""
@@ -327,6 +679,18 @@ def _tac_dict(instr: TACInstr) -> dict:
     return {"op": instr.op, "arg1": instr.arg1, "arg2": instr.arg2, "result": instr.result}
 
 
+def _simulation_dict(run: SimulationResult) -> dict:
+    return {
+        "cycles": run.cycles,
+        "instructions": run.instructions,
+        "memory_reads": run.memory_reads,
+        "memory_writes": run.memory_writes,
+        "registers_used": run.registers_used,
+        "max_live_registers": run.max_live_registers,
+        "memory": run.memory,
+    }
+
+
 def _diag_dict(diag: Diagnostic) -> dict:
     return {
         "phase": diag.phase.value,
@@ -334,6 +698,9 @@ def _diag_dict(diag: Diagnostic) -> dict:
         "message": diag.message,
         "line": diag.span.line if diag.span else None,
         "col": diag.span.col if diag.span else None,
+        "end_line": diag.end.line if diag.end else None,
+        "end_col": diag.end.col if diag.end else None,
+        "count": diag.count,
     }
 
 
@@ -342,6 +709,8 @@ def _ast_dict(program: ast.Program) -> dict:
 
 
 def _node_dict(node) -> dict:
+    from . import ast
+
     if isinstance(node, ast.Program):
         return {"statements": [_node_dict(s) for s in node.statements]}
     if isinstance(node, ast.Declaration):
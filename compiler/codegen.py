@@ -1,73 +1,466 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from abc import ABC, abstractmethod
+from array import array
+from collections.abc import Callable, Iterator, MutableMapping, Sequence
+from dataclasses import dataclass, field
+from enum import Enum, IntEnum
+from functools import cached_property
 
-from .tac import TACInstr, TACProgram
+from .tac import (
+    CONST,
+    OP_ADD,
+    OP_ASSIGN,
+    OP_NOP,
+    TEMP,
+    TACColumns,
+    TACInstr,
+    TACProgram,
+    is_temp,
+    temp_key,
+)
+
+
+class Target(str, Enum):
+    ACCUMULATOR = "accumulator"
+    RISC = "risc"
+    STACK = "stack"
+
+
+class Opcode(IntEnum):
+    # One opcode space for every target; each target uses a subset. ADD and MUL
+    # are two-operand on the accumulator, three-address on RISC and operate on
+    # the top of the stack on the stack machine.
+    LOAD = 0
+    LOADI = 1
+    STORE = 2
+    ADD = 3
+    ADDI = 4
+    MUL = 5
+    MULI = 6
+    PUSH = 7
+    PUSHI = 8
+    POP = 9
+
+
+LOAD, LOADI, STORE, ADD, ADDI, MUL, MULI, PUSH, PUSHI, POP = (int(op) for op in Opcode)
+
+_MNEMONICS = [op.name for op in Opcode]
+
+
+def format_instr(opcode: int, a: int, b: int, names: list[str]) -> str:
+    # Operands are register numbers, except LOAD/STORE memory operands (indices into
+    # `names`) and the immediates of LOADI/ADDI/MULI.
+    if opcode == LOAD:
+        return f"LOAD R{a}, {names[b]}"
+    if opcode == STORE:
+        return f"STORE {names[a]}, R{b}"
+    if opcode == ADD or opcode == MUL:
+        return f"{_MNEMONICS[opcode]} R{a}, R{b}"
+    return f"{_MNEMONICS[opcode]} R{a}, {b}"
+
+
+def format_risc(opcode: int, a: int, b: int, c: int, names: list[str]) -> str:
+    if opcode == LOAD:
+        return f"LOAD R{a}, {names[b]}"
+    if opcode == STORE:
+        return f"STORE {names[a]}, R{b}"
+    if opcode == LOADI:
+        return f"LOADI R{a}, {b}"
+    if opcode == ADD or opcode == MUL:
+        return f"{_MNEMONICS[opcode]} R{a}, R{b}, R{c}"
+    return f"{_MNEMONICS[opcode]} R{a}, R{b}, {c}"
+
+
+def format_stack(opcode: int, a: int, names: list[str]) -> str:
+    if opcode == PUSH or opcode == POP:
+        return f"{_MNEMONICS[opcode]} {names[a]}"
+    if opcode == PUSHI:
+        return f"PUSHI {a}"
+    return _MNEMONICS[opcode]
 
 
 @dataclass(frozen=True)
 class AssemblyProgram:
-    instructions: list[str]
+    # Instructions are stored as parallel columns: opcode, first and second operand.
+    # RISC programs fill a third operand column `c`; stack programs only use `a`.
+    ops: array = field(default_factory=lambda: array("B"))
+    a: list[int] = field(default_factory=list)
+    b: list[int] = field(default_factory=list)
+    names: list[str] = field(default_factory=list)
+    registers: int = 0
+    target: Target = Target.ACCUMULATOR
+    c: list[int] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.ops)
 
+    def __iter__(self) -> Iterator[tuple[int, int, int]]:
+        return zip(self.ops, self.a, self.b)
+
+    @cached_property
+    def instructions(self) -> list[str]:
+        names = self.names
+        if self.target == Target.RISC:
+            rows = zip(self.ops, self.a, self.b, self.c)
+            return [format_risc(op, a, b, c, names) for op, a, b, c in rows]
+        if self.target == Target.STACK:
+            return [format_stack(op, a, names) for op, a in zip(self.ops, self.a)]
+        return [format_instr(op, a, b, names) for op, a, b in self]
+
+
+class Emitter(ABC):
+    # Shared by every target: the name table of memory operands and the
+    # instruction columns. Subclasses lower TAC in one pass with `lower`.
+    target = Target.ACCUMULATOR
 
-class RegisterAllocator:
     def __init__(self) -> None:
         self._counter = 0
-        self._map: dict[str, str] = {}
-        self._instructions: list[str] = []
+        self._names: list[str] = []
+        self._name_ids: dict[str, int] = {}
+        self._ops = array("B")
+        self._a: list[int] = []
+        self._b: list[int] = []
+        self._c: list[int] = []
+
+    def name_id(self, name: str) -> int:
+        idx = self._name_ids.get(name)
+        if idx is None:
+            idx = self._name_ids[name] = len(self._names)
+            self._names.append(name)
+        return idx
+
+    def emit(self, opcode: int, a: int, b: int = 0) -> None:
+        self._ops.append(opcode)
+        self._a.append(a)
+        self._b.append(b)
+
+    @abstractmethod
+    def lower(
+        self,
+        instructions: Sequence[TACInstr],
+        shared: frozenset[str] = frozenset(),
+        temps: frozenset[str] | None = None,
+    ) -> None: ...
+
+    def lower_program(self, tac: TACProgram) -> None:
+        # Temps are lowered under their temp keys, so their registers and memory
+        # cells never mix with a variable spelled the same.
+        cols = tac.columns
+        shared = frozenset(map(temp_key, tac.shared))
+        self.lower(cols.decode_all(cols.keys()), shared, cols.temp_keys())
+
+    def program(self) -> AssemblyProgram:
+        return AssemblyProgram(
+            self._ops, self._a, self._b, self._names, self._counter, self.target, self._c
+        )
+
+    def register_count(self) -> int:
+        return self._counter
+
+    def instruction_count(self) -> int:
+        return len(self._ops)
+
+
+class RegisterFile(Emitter):
+    # Register bindings shared by the register targets: which names each register
+    # holds, so values are reused until an instruction overwrites them.
+    def __init__(
+        self,
+        counter: int = 0,
+        regmap: MutableMapping[str, int] | None = None,
+        holders: MutableMapping[int, list[str]] | None = None,
+    ) -> None:
+        # A resumed allocator continues numbering after `counter` and starts with
+        # the names already bound to registers; the instruction columns and name
+        # table are always fresh.
+        super().__init__()
+        self._counter = counter
+        self._map: MutableMapping[str, int] = regmap if regmap is not None else {}
+        self._holders: MutableMapping[int, list[str]] = holders if holders is not None else {}
+
+    def bindings(self) -> tuple[MutableMapping[str, int], MutableMapping[int, list[str]]]:
+        return self._map, self._holders
+
 
-    def _new_reg(self) -> str:
+class RegisterAllocator(RegisterFile):
+    # Accumulator target: two-operand instructions that overwrite their left operand.
+    def lower(
+        self,
+        instructions: Sequence[TACInstr],
+        shared: frozenset[str] = frozenset(),
+        temps: frozenset[str] | None = None,
+    ) -> None:
+        self.lower_columns(TACColumns.from_instructions(list(instructions), shared, temps))
+
+    def lower_program(self, tac: TACProgram) -> None:
+        self.lower_columns(tac.columns)
+
+    def lower_columns(self, cols: TACColumns) -> None:
+        # Hot loop of `generate`: loading, binding, clobbering and storing are
+        # inlined over local aliases because per-call overhead dominates codegen.
+        # Opcodes and operand kinds are read from the TAC columns as integers.
+        regmap, holders = self._map, self._holders
+        emit_op, emit_a, emit_b = self._ops.append, self._a.append, self._b.append
+        counter = self._counter
+        # Bindings and memory cells are keyed by temp key for temps, by name for
+        # variables.
+        keys, consts = cols.keys(), cols.consts
+        # Assembly name ids of the keys, filled in on first use.
+        ids = [-1] * len(keys)
+        # Shared temps are read more than once. One still pending reads when its
+        # register is overwritten is spilled to memory and reloaded later.
+        pending = _pending_reads(cols) if cols.shared else None
+
+        def name_id(idx: int) -> int:
+            asm = ids[idx]
+            if asm < 0:
+                asm = ids[idx] = self.name_id(keys[idx])
+            return asm
+
+        def reg_of(operand: int) -> int:
+            nonlocal counter
+            if operand & 3 == CONST:
+                counter += 1
+                emit_op(LOADI)
+                emit_a(counter)
+                emit_b(consts[operand >> 2])
+                return counter
+            value = keys[operand >> 2]
+            if pending is not None and value in pending:
+                pending[value] -= 1
+            reg = regmap.get(value)
+            if reg is None:
+                counter += 1
+                reg = regmap[value] = counter
+                holders[reg] = [value]
+                emit_op(LOAD)
+                emit_a(reg)
+                emit_b(name_id(operand >> 2))
+            return reg
+
+        for op, x, y, r in cols.rows():
+            if op == OP_ASSIGN:
+                reg = reg_of(x)
+                result = keys[r >> 2]
+                emit_op(STORE)
+                emit_a(name_id(r >> 2))
+                emit_b(reg)
+                regmap[result] = reg
+                holders.setdefault(reg, []).append(result)
+                continue
+            if op == OP_NOP:
+                continue
+
+            left = reg_of(x)
+            immediate = y & 3 == CONST
+            right = consts[y >> 2] if immediate else reg_of(y)
+            if pending is not None:
+                for name in holders.get(left, ()):
+                    if pending.get(name) and regmap.get(name) == left:
+                        emit_op(STORE)
+                        emit_a(self.name_id(name))
+                        emit_b(left)
+                        del pending[name]
+            if immediate:
+                emit_op(ADDI if op == OP_ADD else MULI)
+            else:
+                emit_op(ADD if op == OP_ADD else MUL)
+            emit_a(left)
+            emit_b(right)
+            for name in holders.pop(left, ()):
+                if regmap.get(name) == left:
+                    del regmap[name]
+            result = keys[r >> 2]
+            regmap[result] = left
+            holders[left] = [result]
+            if r & 3 != TEMP:
+                emit_op(STORE)
+                emit_a(name_id(r >> 2))
+                emit_b(left)
+
+        self._counter = counter
+
+
+class RiscAllocator(RegisterFile):
+    # Three-address load/store target on the same register bindings. Sources are
+    # never overwritten, so shared temps need no spills; the destination reuses
+    # the register of a temp operand that dies here, else takes a new one.
+    target = Target.RISC
+
+    def _new_reg(self) -> int:
         self._counter += 1
-        return f"R{self._counter}"
+        return self._counter
+
+    def bind(self, name: str, reg: int) -> None:
+        self._map[name] = reg
+        self._holders.setdefault(reg, []).append(name)
+
+    def clobber(self, reg: int) -> None:
+        # `reg` is about to be overwritten; names it held must be reloaded from memory.
+        for name in self._holders.pop(reg, []):
+            if self._map.get(name) == reg:
+                del self._map[name]
+
+    def emit3(self, opcode: int, a: int, b: int, c: int) -> None:
+        self._ops.append(opcode)
+        self._a.append(a)
+        self._b.append(b)
+        self._c.append(c)
 
-    def ensure_reg(self, value: str | int) -> str:
+    def ensure_reg(self, value: str | int) -> int:
         if isinstance(value, int):
             reg = self._new_reg()
-            self._instructions.append(f"LOADI {reg}, {value}")
+            self.emit3(LOADI, reg, value, 0)
             return reg
         if value in self._map:
             return self._map[value]
         reg = self._new_reg()
-        self._map[value] = reg
-        self._instructions.append(f"LOAD {reg}, {value}")
+        self.bind(value, reg)
+        self.emit3(LOAD, reg, self.name_id(value), 0)
         return reg
 
-    def bind(self, name: str, reg: str) -> None:
-        self._map[name] = reg
+    def lower(
+        self,
+        instructions: Sequence[TACInstr],
+        shared: frozenset[str] = frozenset(),
+        temps: frozenset[str] | None = None,
+    ) -> None:
+        # Without `temps`, the names TAC generation spells as temps are taken as such.
+        is_temp_name = is_temp if temps is None else temps.__contains__
+        for instr in instructions:
+            if instr.op == "ASSIGN":
+                reg = self.ensure_reg(instr.arg1)  # type: ignore[arg-type]
+                self.emit3(STORE, self.name_id(instr.result), reg, 0)
+                self.bind(instr.result, reg)
+                continue
+            if instr.op != "+" and instr.op != "*":
+                raise ValueError(f"Unsupported TAC op: {instr.op}")
 
-    def emit(self, instruction: str) -> None:
-        self._instructions.append(instruction)
+            left = self.ensure_reg(instr.arg1)  # type: ignore[arg-type]
+            arg2 = instr.arg2
+            if arg2 is None:
+                raise ValueError(f"Missing TAC operand for {instr.op}")
+            right = arg2 if isinstance(arg2, int) else self.ensure_reg(arg2)
+            if _dies(instr.arg1, shared, is_temp_name):
+                dest = left
+            elif not isinstance(arg2, int) and _dies(arg2, shared, is_temp_name):
+                dest = right
+            else:
+                dest = self._new_reg()
+            if isinstance(arg2, int):
+                self.emit3(ADDI if instr.op == "+" else MULI, dest, left, right)
+            else:
+                self.emit3(ADD if instr.op == "+" else MUL, dest, left, right)
+            self.clobber(dest)
+            self.bind(instr.result, dest)
+            if not is_temp_name(instr.result):
+                self.emit3(STORE, self.name_id(instr.result), dest, 0)
 
-    def instructions(self) -> list[str]:
-        return self._instructions
 
+class StackEmitter(Emitter):
+    # Zero-address target. Temps are left on the stack for the instruction that
+    # consumes them; shared temps, and temps that are not on top when needed, go
+    # through memory like variables.
+    target = Target.STACK
 
-def generate(tac: TACProgram) -> AssemblyProgram:
-    allocator = RegisterAllocator()
+    def __init__(self) -> None:
+        super().__init__()
+        self._stack: list[str] = []
 
-    for instr in tac.instructions:
-        _emit_instr(instr, allocator)
+    def _push(self, value: str | int) -> None:
+        if isinstance(value, int):
+            self.emit(PUSHI, value)
+        else:
+            self.emit(PUSH, self.name_id(value))
+        self._stack.append("")
 
-    return AssemblyProgram(instructions=allocator.instructions())
+    def _pop(self, name: str) -> None:
+        self.emit(POP, self.name_id(name))
+        self._stack.pop()
 
+    def _ready(self, args: list[str | int]) -> int:
+        # How many leading operands already sit on top of the stack, in order.
+        for k in range(len(args), 0, -1):
+            if self._stack[-k:] == args[:k]:
+                return k
+        return 0
 
-def _emit_instr(instr: TACInstr, allocator: RegisterAllocator) -> None:
-    if instr.op == "ASSIGN":
-        reg = allocator.ensure_reg(instr.arg1)  # type: ignore[arg-type]
-        allocator.emit(f"STORE {instr.result}, {reg}")
-        allocator.bind(instr.result, reg)
-        return
+    def _operands(self, args: list[str | int]) -> None:
+        stack = self._stack
+        if len(args) == 2 and self._ready(args[::-1]) > self._ready(args):
+            args = args[::-1]  # + and * commute
+        ready = self._ready(args)
+        missing = args[ready:]
+        held = [stack.index(arg) for arg in missing if arg in stack]
+        if held:
+            # An operand is buried: spill it and everything above it.
+            for idx in range(len(stack) - 1, min(held) - 1, -1):
+                self._pop(stack[idx])
+            self._operands(args)
+            return
+        for arg in missing:
+            self._push(arg)
+
+    def lower(
+        self,
+        instructions: Sequence[TACInstr],
+        shared: frozenset[str] = frozenset(),
+        temps: frozenset[str] | None = None,
+    ) -> None:
+        is_temp_name = is_temp if temps is None else temps.__contains__
+        stack = self._stack
+        for instr in instructions:
+            if instr.op == "ASSIGN":
+                self._operands([instr.arg1])  # type: ignore[list-item]
+            elif instr.op == "+" or instr.op == "*":
+                self._operands([instr.arg1, instr.arg2])  # type: ignore[list-item]
+                self.emit(ADD if instr.op == "+" else MUL, 0)
+                stack.pop()
+            else:
+                raise ValueError(f"Unsupported TAC op: {instr.op}")
+            stack[-1] = instr.result
+            if not is_temp_name(instr.result) or instr.result in shared:
+                self._pop(instr.result)
+        while stack:
+            self._pop(stack[-1])
+
+    def register_count(self) -> int:
+        return 0
+
+
+TARGETS: dict[Target, type[Emitter]] = {
+    Target.ACCUMULATOR: RegisterAllocator,
+    Target.RISC: RiscAllocator,
+    Target.STACK: StackEmitter,
+}
+
+
+def generate(
+    tac: TACProgram,
+    allocator: Emitter | None = None,
+    *,
+    target: Target | str = Target.ACCUMULATOR,
+) -> AssemblyProgram:
+    allocator = allocator or TARGETS[Target(target)]()
+    allocator.lower_program(tac)
+    return allocator.program()
+
+
+def _dies(
+    arg: str | int | None, shared: frozenset[str], is_temp_name: Callable[[str], bool]
+) -> bool:
+    # Unshared temps are read exactly once.
+    return isinstance(arg, str) and is_temp_name(arg) and arg not in shared
 
-    if instr.op in {"+", "*"}:
-        left_reg = allocator.ensure_reg(instr.arg1)  # type: ignore[arg-type]
-        if isinstance(instr.arg2, int):
-            op = "ADDI" if instr.op == "+" else "MULI"
-            allocator.emit(f"{op} {left_reg}, {instr.arg2}")
-        else:
-            right_reg = allocator.ensure_reg(instr.arg2)  # type: ignore[arg-type]
-            op = "ADD" if instr.op == "+" else "MUL"
-            allocator.emit(f"{op} {left_reg}, {right_reg}")
-        allocator.bind(instr.result, left_reg)
-        return
 
-    raise ValueError(f"Unsupported TAC op: {instr.op}")
+def _pending_reads(cols: TACColumns) -> dict[str, int]:
+    # Reads of each shared temp, by temp key.
+    reads = dict.fromkeys(map(temp_key, cols.shared), 0)
+    keys = cols.keys()
+    for _, x, y, _ in cols.rows():
+        if x & 3 == TEMP and keys[x >> 2] in reads:
+            reads[keys[x >> 2]] += 1
+        if y & 3 == TEMP and keys[y >> 2] in reads:
+            reads[keys[y >> 2]] += 1
+    return reads
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+from functools import cached_property
+
+from . import ast
+
+
+@dataclass(frozen=True)
+class DependencyGraph:
+    # Nodes are declaration indices. `deps` holds read-after-write edges (the
+    # values a declaration reads); `preds` adds the write-after-read and
+    # write-after-write edges of redeclared names, so any order that respects
+    # `preds` computes the same values. Every edge points to an earlier index.
+    targets: list[str]
+    deps: list[tuple[int, ...]]
+    preds: list[tuple[int, ...]]
+    last_def: dict[str, int]
+
+    def __len__(self) -> int:
+        return len(self.targets)
+
+    @cached_property
+    def levels(self) -> list[int]:
+        # Level 1 declarations depend on nothing; a declaration can run once every
+        # lower level has finished.
+        levels: list[int] = []
+        for preds in self.preds:
+            levels.append(1 + max((levels[p] for p in preds), default=0))
+        return levels
+
+    def critical_path(self) -> list[int]:
+        levels = self.levels
+        if not levels:
+            return []
+        node = max(range(len(levels)), key=levels.__getitem__)
+        path = [node]
+        while self.preds[node]:
+            node = max(self.preds[node], key=levels.__getitem__)
+            path.append(node)
+        path.reverse()
+        return path
+
+    def critical_path_length(self) -> int:
+        return max(self.levels, default=0)
+
+    def wavefronts(self) -> list[list[int]]:
+        fronts: list[list[int]] = [[] for _ in range(self.critical_path_length())]
+        for node, level in enumerate(self.levels):
+            fronts[level - 1].append(node)
+        return fronts
+
+    def independent_groups(self) -> list[list[int]]:
+        # Connected components: declarations in different groups share no value
+        # and no name, so the groups can be compiled in any order or in parallel.
+        parent = list(range(len(self.targets)))
+
+        def find(node: int) -> int:
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        for node, preds in enumerate(self.preds):
+            for pred in preds:
+                a, b = find(node), find(pred)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+
+        groups: dict[int, list[int]] = {}
+        for node in range(len(self.targets)):
+            groups.setdefault(find(node), []).append(node)
+        return list(groups.values())
+
+    def slice(self, outputs: Iterable[str]) -> list[int]:
+        # Walks back from the final definition of each output along value edges,
+        # so the cost is proportional to its transitive dependencies.
+        needed: set[int] = set()
+        stack: list[int] = []
+        for name in outputs:
+            if name not in self.last_def:
+                raise ValueError(f"Unknown output variable: {name}")
+            stack.append(self.last_def[name])
+        while stack:
+            node = stack.pop()
+            if node in needed:
+                continue
+            needed.add(node)
+            stack.extend(self.deps[node])
+        return sorted(needed)
+
+    def schedule(self, nodes: Iterable[int] | None = None) -> list[int]:
+        # Consumer-driven order: each declaration with no dependents pulls in its
+        # unscheduled inputs depth-first right before itself. Values are then used
+        # close to their definition, which keeps fewer registers live in codegen.
+        selected = set(range(len(self.targets)) if nodes is None else nodes)
+        used: set[int] = set()
+        for node in selected:
+            used.update(p for p in self.preds[node] if p in selected)
+        order: list[int] = []
+        done: set[int] = set()
+        for sink in sorted(selected - used):
+            stack = [(sink, False)]
+            while stack:
+                node, expanded = stack.pop()
+                if node in done:
+                    continue
+                if expanded:
+                    done.add(node)
+                    order.append(node)
+                    continue
+                stack.append((node, True))
+                for pred in reversed(self.preds[node]):
+                    if pred not in done and pred in selected:
+                        stack.append((pred, False))
+        return order
+
+
+def build(program: ast.Program) -> DependencyGraph:
+    targets: list[str] = []
+    deps: list[tuple[int, ...]] = []
+    preds: list[tuple[int, ...]] = []
+    last_def: dict[str, int] = {}
+    readers: dict[str, list[int]] = {}
+
+    for idx, decl in enumerate(program.statements):
+        target = decl.assignment.target.name
+        reads = _reads(decl.assignment.value)
+        value_deps = tuple(sorted({last_def[name] for name in reads if name in last_def}))
+        order = set(value_deps)
+        if target in last_def:
+            order.add(last_def[target])
+        # Earlier reads of `target` (of a previous definition or of the free input)
+        # must stay before this write.
+        order.update(readers.pop(target, ()))
+        for name in reads:
+            readers.setdefault(name, []).append(idx)
+        last_def[target] = idx
+        targets.append(target)
+        deps.append(value_deps)
+        preds.append(tuple(sorted(order)))
+
+    return DependencyGraph(targets, deps, preds, last_def)
+
+
+def select(
+    program: ast.Program, outputs: Iterable[str] | None = None, schedule: bool = False
+) -> ast.Program:
+    graph = build(program)
+    nodes = graph.slice(outputs) if outputs is not None else None
+    if schedule:
+        nodes = graph.schedule(nodes)
+    elif nodes is None:
+        return program
+    statements = [program.statements[idx] for idx in nodes]
+    return ast.Program(statements=statements, span_table=program.span_table)
+
+
+def _reads(expr: ast.Expr) -> set[str]:
+    names: set[str] = set()
+    stack = [expr]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.Identifier):
+            names.add(node.name)
+        elif isinstance(node, ast.BinaryExpr):
+            stack.append(node.left)
+            stack.append(node.right)
+    return names
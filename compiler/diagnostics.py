@@ -1,7 +1,13 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import re
+from bisect import bisect_right
+from dataclasses import dataclass, field, replace
 from enum import Enum
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from mmap import mmap
 
 
 class Phase(str, Enum):
@@ -13,10 +19,77 @@ class Phase(str, Enum):
     OPTIMIZER = "optimizer"
 
 
+DEFAULT_PHASE_LIMIT = 100
+DEFAULT_TOTAL_LIMIT = 250
+SUPPRESSED_CODE = "DIAG001"
+
+# Runs of one error in these phases come from a single bad region of input, so
+# consecutive same-code diagnostics on adjacent lines are merged into one range.
+COALESCED_PHASES = frozenset({Phase.LEXER, Phase.PARSER})
+
+_TEXT_NEWLINE = re.compile("\n")
+_BYTES_NEWLINE = re.compile(b"\n")
+
+
+class SourceMap:
+    # Maps offsets to 1-based (line, col) and slices lexemes out of the source.
+    # The source may be text or a byte buffer (bytes, mmap, memoryview); for
+    # buffers, offsets count bytes and columns still count characters. The
+    # line-start index is built on the first lookup, so sources whose positions
+    # are never shown pay nothing.
+    def __init__(self, source: str | bytes | mmap | memoryview) -> None:
+        self.source = source
+        self._line_starts: list[int] | None = None
+
+    @classmethod
+    def from_line_starts(cls, line_starts: list[int]) -> SourceMap:
+        # Positions only: used for spans restored without their source text.
+        source_map = cls("")
+        source_map._line_starts = line_starts
+        return source_map
+
+    def line_starts(self) -> list[int]:
+        if self._line_starts is None:
+            source = self.source
+            starts = [0]
+            if isinstance(source, str):
+                starts.extend(m.end() for m in _TEXT_NEWLINE.finditer(source))
+            else:
+                starts.extend(m.end() for m in _BYTES_NEWLINE.finditer(source))
+            self._line_starts = starts
+        return self._line_starts
+
+    def position(self, offset: int) -> tuple[int, int]:
+        starts = self.line_starts()
+        line = bisect_right(starts, offset)
+        start = starts[line - 1]
+        source = self.source
+        if isinstance(source, str):
+            return line, offset - start + 1
+        # Columns count characters either way: the bytes before the offset on its
+        # line are decoded as the lexer decodes them.
+        prefix = bytes(source[start:offset]).decode("utf-8", "surrogateescape")
+        return line, len(prefix) + 1
+
+    def text(self, start: int, end: int) -> str:
+        chunk = self.source[start:end]
+        if isinstance(chunk, str):
+            return chunk
+        return bytes(chunk).decode("utf-8", "replace")
+
+
 @dataclass(frozen=True)
 class Span:
-    line: int
-    col: int
+    offset: int
+    source: SourceMap | None = field(default=None, compare=False, repr=False)
+
+    @property
+    def line(self) -> int:
+        return self.source.position(self.offset)[0] if self.source else 1
+
+    @property
+    def col(self) -> int:
+        return self.source.position(self.offset)[1] if self.source else self.offset + 1
 
 
 @dataclass(frozen=True)
@@ -25,7 +98,71 @@ class Diagnostic:
     code: str
     message: str
     span: Span | None = None
+    end: Span | None = None
+    count: int = 1
 
 
 def diag(phase: Phase, code: str, message: str, span: Span | None = None) -> Diagnostic:
     return Diagnostic(phase=phase, code=code, message=message, span=span)
+
+
+@dataclass(frozen=True)
+class DiagnosticLimits:
+    per_phase: int = DEFAULT_PHASE_LIMIT
+    total: int = DEFAULT_TOTAL_LIMIT
+
+
+class DiagnosticSink:
+    def __init__(self, limits: DiagnosticLimits | None = None) -> None:
+        self.limits = limits or DiagnosticLimits()
+        self.diagnostics: list[Diagnostic] = []
+        self.suppressed: dict[Phase, int] = {}
+        self._counts: dict[Phase, int] = {}
+
+    def accepts(self, phase: Phase) -> bool:
+        return (
+            len(self.diagnostics) < self.limits.total
+            and self._counts.get(phase, 0) < self.limits.per_phase
+        )
+
+    def report(self, diagnostic: Diagnostic) -> None:
+        diagnostics = self.diagnostics
+        if diagnostics and diagnostic.phase in COALESCED_PHASES:
+            last = diagnostics[-1]
+            last_end = last.end or last.span
+            if (
+                last.phase == diagnostic.phase
+                and last.code == diagnostic.code
+                and last_end is not None
+                and diagnostic.span is not None
+                and diagnostic.span.line <= last_end.line + 1
+            ):
+                diagnostics[-1] = replace(
+                    last,
+                    end=diagnostic.end or diagnostic.span,
+                    count=last.count + diagnostic.count,
+                )
+                return
+        phase = diagnostic.phase
+        if not self.accepts(phase):
+            self.suppressed[phase] = self.suppressed.get(phase, 0) + diagnostic.count
+            return
+        self._counts[phase] = self._counts.get(phase, 0) + 1
+        diagnostics.append(diagnostic)
+
+    def extend(self, diagnostics: list[Diagnostic]) -> None:
+        for diagnostic in diagnostics:
+            self.report(diagnostic)
+
+    def finish(self, phase: Phase | None = None) -> list[Diagnostic]:
+        kept = [d for d in self.diagnostics if phase is None or d.phase == phase]
+        for suppressed_phase, count in self.suppressed.items():
+            if phase is None or suppressed_phase == phase:
+                kept.append(
+                    diag(
+                        suppressed_phase,
+                        SUPPRESSED_CODE,
+                        f"{count} more diagnostics suppressed",
+                    )
+                )
+        return kept
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+
+from .tac import CONST, NONE, OP_ADD, OP_ASSIGN, OP_MUL, OP_NAMES, OP_NOP, VAR, TACProgram
+
+
+@dataclass(frozen=True)
+class Evaluation:
+    values: dict[str, int]
+    executed: int
+    op_counts: dict[str, int]
+
+
+class CompiledTAC:
+    # Slots are assigned per encoded operand of the TAC columns, so a temp and a
+    # variable spelled the same are kept apart.
+    def __init__(self, program: TACProgram) -> None:
+        cols = program.columns
+        self.slots: dict[int, int] = {}
+        self.free: list[str] = []
+        self._names, self._consts = cols.names, cols.consts
+        self._initial: list[int] = []
+        self._free_slots: list[tuple[str, int]] = []
+        self._op_counts: dict[str, int] = {}
+        code: list[tuple[int, int, int, int]] = []
+
+        for op, x, y, r in cols.rows():
+            if op == OP_NOP:
+                continue
+            a = self._operand(x)
+            b = self._operand(y) if op != OP_ASSIGN else 0
+            code.append((op, self._target(r), a, b))
+            name = OP_NAMES[op]
+            self._op_counts[name] = self._op_counts.get(name, 0) + 1
+
+        self.code = code
+        self._outputs = [
+            (self._names[operand >> 2], slot)
+            for operand, slot in self.slots.items()
+            if operand & 3 == VAR
+        ]
+
+    def _operand(self, operand: int) -> int:
+        slot = self.slots.get(operand)
+        if slot is not None:
+            return slot
+        tag = operand & 3
+        if tag == NONE:
+            raise ValueError("Missing TAC operand")
+        slot = self.slots[operand] = len(self._initial)
+        if tag == CONST:
+            self._initial.append(self._consts[operand >> 2])
+        else:
+            self._initial.append(0)
+            name = self._names[operand >> 2]
+            self.free.append(name)
+            self._free_slots.append((name, slot))
+        return slot
+
+    def _target(self, operand: int) -> int:
+        slot = self.slots.get(operand)
+        if slot is None:
+            slot = self.slots[operand] = len(self._initial)
+            self._initial.append(0)
+        return slot
+
+    def _check_inputs(self, inputs: Mapping[str, int]) -> None:
+        missing = [name for name in self.free if name not in inputs]
+        if missing:
+            raise ValueError(f"Missing values for free variables: {', '.join(missing)}")
+
+    def evaluate(self, inputs: Mapping[str, int] | None = None) -> Evaluation:
+        inputs = inputs or {}
+        self._check_inputs(inputs)
+        s = list(self._initial)
+        for name, slot in self._free_slots:
+            s[slot] = inputs[name]
+
+        for op, dst, a, b in self.code:
+            if op == OP_ADD:
+                s[dst] = s[a] + s[b]
+            elif op == OP_MUL:
+                s[dst] = s[a] * s[b]
+            else:
+                s[dst] = s[a]
+
+        return Evaluation(
+            values={name: s[slot] for name, slot in self._outputs},
+            executed=len(self.code),
+            op_counts=dict(self._op_counts),
+        )
+
+    def evaluate_batch(self, inputs: Sequence[Mapping[str, int]]) -> list[Evaluation]:
+        # Columnar evaluation: each slot holds one value per input vector, so the
+        # dispatch cost is paid once per instruction rather than once per vector.
+        n = len(inputs)
+        if n == 0:
+            return []
+        for vector in inputs:
+            self._check_inputs(vector)
+        cols: list[list[int]] = [[value] * n for value in self._initial]
+        for name, slot in self._free_slots:
+            cols[slot] = [vector[name] for vector in inputs]
+
+        for op, dst, a, b in self.code:
+            if op == OP_ADD:
+                cols[dst] = [x + y for x, y in zip(cols[a], cols[b])]
+            elif op == OP_MUL:
+                cols[dst] = [x * y for x, y in zip(cols[a], cols[b])]
+            else:
+                cols[dst] = cols[a]
+
+        executed = len(self.code)
+        return [
+            Evaluation(
+                values={name: cols[slot][i] for name, slot in self._outputs},
+                executed=executed,
+                op_counts=dict(self._op_counts),
+            )
+            for i in range(n)
+        ]
+
+
+def evaluate(program: TACProgram, inputs: Mapping[str, int] | None = None) -> Evaluation:
+    return CompiledTAC(program).evaluate(inputs)
@@ -1,9 +1,16 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import re
+from collections.abc import Sequence
+from dataclasses import dataclass, field
 from enum import Enum
+from itertools import accumulate
+from typing import TYPE_CHECKING
 
-from .diagnostics import Diagnostic, Phase, Span, diag
+from .diagnostics import Diagnostic, DiagnosticSink, Phase, SourceMap, Span
+
+if TYPE_CHECKING:
+    from mmap import mmap
 
 
 class TokenType(str, Enum):
@@ -22,95 +29,223 @@ class TokenType(str, Enum):
 @dataclass(frozen=True)
 class Token:
     type: TokenType
-    lexeme: str
-    span: Span
+    offset: int
+    end: int
     literal: int | None = None
+    source: SourceMap | None = field(default=None, compare=False, repr=False)
 
+    @property
+    def lexeme(self) -> str:
+        return self.source.text(self.offset, self.end) if self.source else ""
 
-KEYWORDS = {"int": TokenType.KEYWORD_INT}
+    @property
+    def span(self) -> Span:
+        return Span(self.offset, self.source)
 
 
-def lex(source: str) -> tuple[list[Token], list[Diagnostic]]:
+KEYWORDS = {"int": TokenType.KEYWORD_INT}
+_PUNCTUATION = {
+    "=": TokenType.ASSIGN,
+    "+": TokenType.PLUS,
+    "*": TokenType.MULTIPLY,
+    ";": TokenType.SEMICOLON,
+    "(": TokenType.LPAREN,
+    ")": TokenType.RPAREN,
+}
+
+# Leading whitespace is consumed by the same match. Groups: 1 word, 2 integer,
+# 3 punctuation. `[^\W\d]` admits a few non-alphabetic word characters (e.g. '²');
+# the scanner rejects those itself.
+_TEXT_TOKEN = re.compile(r"\s*(?:([^\W\d]\w*)|(\d+)|([=+*;()]))")
+_TEXT_SPACE = re.compile(r"\s*")
+_TEXT_BAD = re.compile(r"[^\s\w=+*;()\udc80-\udcff]+")
+# Undecodable bytes surface as lone surrogates from the "surrogateescape" handler.
+_TEXT_INVALID = re.compile(r"[\udc80-\udcff]+")
+
+# Byte input (bytes, mmap, memoryview) is scanned as ASCII. Any run containing a
+# non-ASCII byte is decoded on its own and re-scanned as text, so UTF-8 is only
+# validated where it actually occurs. Whitespace is spelled out because `\s` in a
+# bytes pattern misses \x1c-\x1f, which `\s` in a text pattern accepts.
+_BYTES_TOKEN = re.compile(
+    rb"[ \t\n\r\x0b\x0c\x1c-\x1f]*(?:([A-Za-z_][A-Za-z0-9_]*)|([0-9]+)|([=+*;()]))"
+)
+_BYTES_SPACE = re.compile(rb"[ \t\n\r\x0b\x0c\x1c-\x1f]*")
+_BYTES_BAD = re.compile(rb"[^ \t\n\r\x0b\x0c\x1c-\x1fA-Za-z0-9_=+*;()\x80-\xff]+")
+_BYTES_WIDE = re.compile(rb"[A-Za-z0-9_\x80-\xff]+")
+_BYTES_KEYWORDS = {word.encode(): token_type for word, token_type in KEYWORDS.items()}
+_BYTES_PUNCTUATION = {ord(ch): token_type for ch, token_type in _PUNCTUATION.items()}
+
+
+def lex(
+    source: str | bytes | mmap | memoryview, sink: DiagnosticSink | None = None
+) -> tuple[list[Token], list[Diagnostic]]:
+    # Tokens record start/end offsets only (characters for text, bytes otherwise);
+    # lexemes and line/col are produced through the shared SourceMap on demand.
+    sink = sink or DiagnosticSink()
+    source_map = SourceMap(source)
+    n = len(source)
+    tokens = lex_range(source, 0, n, source_map, sink)
+    tokens.append(Token(TokenType.EOF, n, n, None, source_map))
+    return tokens, sink.finish(Phase.LEXER)
+
+
+def lex_range(
+    source: str | bytes | mmap | memoryview,
+    start: int,
+    stop: int,
+    source_map: SourceMap,
+    sink: DiagnosticSink,
+) -> list[Token]:
+    # Scans source[start:stop] in place, without an EOF token. No token or bad run
+    # spans whitespace or punctuation, so ranges cut right after either lex exactly
+    # as the whole source.
     tokens: list[Token] = []
-    diagnostics: list[Diagnostic] = []
-
-    i = 0
-    line = 1
-    col = 1
-
-    def current() -> str:
-        return source[i] if i < len(source) else ""
+    if isinstance(source, str):
+        _scan_text(source, 0, source_map, tokens, sink, start, stop)
+    else:
+        _scan_bytes(source, source_map, tokens, sink, start, stop)
+    return tokens
+
+
+def _scan_text(
+    source: str,
+    base: int,
+    source_map: SourceMap,
+    tokens: list[Token],
+    sink: DiagnosticSink,
+    i: int = 0,
+    n: int | None = None,
+) -> None:
+    # Character index -> source offset. Decoded byte runs map back to byte offsets.
+    if isinstance(source_map.source, str):
+        at: Sequence[int] = range(len(source) + 1)
+    else:
+        widths = (len(ch.encode("utf-8", "surrogateescape")) for ch in source)
+        at = list(accumulate(widths, initial=base))
+
+    append = tokens.append
+    match = _TEXT_TOKEN.match
+    n = len(source) if n is None else n
+    while i < n:
+        m = match(source, i, n)
+        if m is not None:
+            kind = m.lastindex or 0
+            start = m.start(kind)
+            end = m.end()
+            if kind == 1 and (source[start].isalpha() or source[start] == "_"):
+                token_type = KEYWORDS.get(m.group(1), TokenType.IDENTIFIER)
+                append(Token(token_type, at[start], at[end], None, source_map))
+                i = end
+                continue
+            if kind == 2:
+                literal = int(m.group(2))
+                append(Token(TokenType.INTEGER_LITERAL, at[start], at[end], literal, source_map))
+                i = end
+                continue
+            if kind == 3:
+                append(Token(_PUNCTUATION[source[start]], at[start], at[end], None, source_map))
+                i = end
+                continue
+            i = start
+        else:
+            space = _TEXT_SPACE.match(source, i, n)
+            if space is not None:
+                i = space.end()
+            if i == n:
+                break
 
-    def advance() -> str:
-        nonlocal i, line, col
+        # A run of bad characters is reported once, as a range.
         ch = source[i]
-        i += 1
-        if ch == "\n":
-            line += 1
-            col = 1
+        invalid = _TEXT_INVALID.match(source, i)
+        if invalid is not None:
+            end = invalid.end()
+            code, message = "LEX002", f"Invalid UTF-8 byte 0x{ord(ch) - 0xDC00:02x}"
         else:
-            col += 1
-        return ch
-
-    while i < len(source):
-        ch = current()
-        if ch.isspace():
-            advance()
-            continue
-
-        start_span = Span(line, col)
-
-        if ch.isalpha() or ch == "_":
-            lexeme = advance()
-            while i < len(source) and (current().isalnum() or current() == "_"):
-                lexeme += advance()
-            token_type = KEYWORDS.get(lexeme, TokenType.IDENTIFIER)
-            tokens.append(Token(token_type, lexeme, start_span))
-            continue
-
-        if ch.isdigit():
-            lexeme = advance()
-            while i < len(source) and current().isdigit():
-                lexeme += advance()
-            tokens.append(
-                Token(TokenType.INTEGER_LITERAL, lexeme, start_span, literal=int(lexeme))
-            )
-            continue
-
-        if ch == "=":
-            advance()
-            tokens.append(Token(TokenType.ASSIGN, "=", start_span))
-            continue
-
-        if ch == "+":
-            advance()
-            tokens.append(Token(TokenType.PLUS, "+", start_span))
-            continue
-
-        if ch == "*":
-            advance()
-            tokens.append(Token(TokenType.MULTIPLY, "*", start_span))
-            continue
-
-        if ch == ";":
-            advance()
-            tokens.append(Token(TokenType.SEMICOLON, ";", start_span))
-            continue
-
-        if ch == "(":
-            advance()
-            tokens.append(Token(TokenType.LPAREN, "(", start_span))
+            bad = _TEXT_BAD.match(source, i)
+            end = bad.end() if bad is not None else i + 1
+            code, message = "LEX001", f"Unexpected character '{ch}'"
+        _report_bad(sink, code, message, at[i], at[end - 1], end - i, source_map)
+        i = end
+
+
+def _scan_bytes(
+    source: bytes | mmap | memoryview,
+    source_map: SourceMap,
+    tokens: list[Token],
+    sink: DiagnosticSink,
+    i: int = 0,
+    n: int | None = None,
+) -> None:
+    append = tokens.append
+    match = _BYTES_TOKEN.match
+    n = len(source) if n is None else n
+    while i < n:
+        m = match(source, i, n)
+        if m is None:
+            space = _BYTES_SPACE.match(source, i, n)
+            if space is not None:
+                i = space.end()
+            if i == n:
+                break
+        else:
+            kind = m.lastindex or 0
+            start = m.start(kind)
+            end = m.end()
+            if kind != 3 and end < n and source[end] >= 0x80:
+                i = _scan_wide(source, start, source_map, tokens, sink)
+                continue
+            if kind == 1:
+                token_type = TokenType.IDENTIFIER
+                if end - start == 3:
+                    token_type = _BYTES_KEYWORDS.get(m.group(1), token_type)
+                append(Token(token_type, start, end, None, source_map))
+            elif kind == 2:
+                append(Token(TokenType.INTEGER_LITERAL, start, end, int(m.group(2)), source_map))
+            else:
+                append(Token(_BYTES_PUNCTUATION[source[start]], start, end, None, source_map))
+            i = end
             continue
 
-        if ch == ")":
-            advance()
-            tokens.append(Token(TokenType.RPAREN, ")", start_span))
+        if source[i] >= 0x80:
+            i = _scan_wide(source, i, source_map, tokens, sink)
             continue
-
-        diagnostics.append(
-            diag(Phase.LEXER, "LEX001", f"Unexpected character '{ch}'", start_span)
+        bad = _BYTES_BAD.match(source, i)
+        end = bad.end() if bad is not None else i + 1
+        message = f"Unexpected character '{chr(source[i])}'"
+        _report_bad(sink, "LEX001", message, i, end - 1, end - i, source_map)
+        i = end
+
+
+def _scan_wide(
+    source: bytes | mmap | memoryview,
+    start: int,
+    source_map: SourceMap,
+    tokens: list[Token],
+    sink: DiagnosticSink,
+) -> int:
+    wide = _BYTES_WIDE.match(source, start)
+    end = wide.end() if wide is not None else start + 1
+    text = bytes(source[start:end]).decode("utf-8", "surrogateescape")
+    _scan_text(text, start, source_map, tokens, sink)
+    return end
+
+
+def _report_bad(
+    sink: DiagnosticSink,
+    code: str,
+    message: str,
+    start: int,
+    last: int,
+    count: int,
+    source_map: SourceMap,
+) -> None:
+    sink.report(
+        Diagnostic(
+            Phase.LEXER,
+            code,
+            message,
+            Span(start, source_map),
+            Span(last, source_map) if count > 1 else None,
+            count,
         )
-        advance()
-
-    tokens.append(Token(TokenType.EOF, "", Span(line, col)))
-    return tokens, diagnostics
+    )
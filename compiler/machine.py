@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from .codegen import (
+    ADD,
+    ADDI,
+    LOAD,
+    LOADI,
+    MUL,
+    POP,
+    PUSH,
+    PUSHI,
+    STORE,
+    AssemblyProgram,
+    Opcode,
+    Target,
+    generate,
+)
+
+if TYPE_CHECKING:
+    from .pipeline import CompilationResult
+    from .tac import TACProgram
+
+DEFAULT_CYCLES = {
+    "LOAD": 3,
+    "LOADI": 1,
+    "STORE": 3,
+    "ADD": 1,
+    "ADDI": 1,
+    "MUL": 3,
+    "MULI": 3,
+    "PUSH": 3,
+    "PUSHI": 1,
+    "POP": 3,
+}
+
+
+@dataclass(frozen=True)
+class CostModel:
+    cycles: Mapping[str, int] = field(default_factory=lambda: dict(DEFAULT_CYCLES))
+
+    def cost(self, opcode: str) -> int:
+        if opcode not in self.cycles:
+            raise ValueError(f"No cycle cost for opcode: {opcode}")
+        return self.cycles[opcode]
+
+
+@dataclass(frozen=True)
+class SimulationResult:
+    cycles: int
+    instructions: int
+    memory_reads: int
+    memory_writes: int
+    registers_used: int
+    max_live_registers: int
+    memory: dict[str, int]
+
+    @property
+    def memory_accesses(self) -> int:
+        return self.memory_reads + self.memory_writes
+
+
+@dataclass(frozen=True)
+class SimulationComparison:
+    baseline: SimulationResult
+    optimized: SimulationResult
+
+    @property
+    def cycles_saved(self) -> int:
+        return self.baseline.cycles - self.optimized.cycles
+
+    @property
+    def speedup(self) -> float:
+        return self.baseline.cycles / self.optimized.cycles if self.optimized.cycles else 0.0
+
+
+def simulate(
+    program: AssemblyProgram,
+    memory: Mapping[str, int] | None = None,
+    model: CostModel | None = None,
+) -> SimulationResult:
+    model = model or CostModel()
+    used = set(program.ops)
+    costs = [model.cost(op.name) if op in used else 0 for op in Opcode]
+    names = program.names
+    mem = dict(memory or {})
+    if program.target == Target.RISC:
+        return _simulate_risc(program, mem, costs)
+    if program.target == Target.STACK:
+        return _simulate_stack(program, mem, costs)
+    regs: dict[int, int] = {}
+
+    cycles = reads = writes = 0
+    for op, a, b in program:
+        cycles += costs[op]
+        if op == LOAD:
+            name = names[b]
+            if name not in mem:
+                raise ValueError(f"Load from uninitialized memory: {name}")
+            regs[a] = mem[name]
+            reads += 1
+        elif op == LOADI:
+            regs[a] = b
+        elif op == STORE:
+            mem[names[a]] = regs[b]
+            writes += 1
+        elif op == ADD:
+            regs[a] += regs[b]
+        elif op == ADDI:
+            regs[a] += b
+        elif op == MUL:
+            regs[a] *= regs[b]
+        else:
+            regs[a] *= b
+
+    return SimulationResult(
+        cycles=cycles,
+        instructions=len(program),
+        memory_reads=reads,
+        memory_writes=writes,
+        registers_used=len(regs),
+        max_live_registers=_max_live(program),
+        memory=mem,
+    )
+
+
+def _simulate_risc(
+    program: AssemblyProgram, mem: dict[str, int], costs: list[int]
+) -> SimulationResult:
+    names = program.names
+    regs: dict[int, int] = {}
+    cycles = reads = writes = 0
+    for op, a, b, c in zip(program.ops, program.a, program.b, program.c):
+        cycles += costs[op]
+        if op == LOAD:
+            name = names[b]
+            if name not in mem:
+                raise ValueError(f"Load from uninitialized memory: {name}")
+            regs[a] = mem[name]
+            reads += 1
+        elif op == LOADI:
+            regs[a] = b
+        elif op == STORE:
+            mem[names[a]] = regs[b]
+            writes += 1
+        elif op == ADD:
+            regs[a] = regs[b] + regs[c]
+        elif op == ADDI:
+            regs[a] = regs[b] + c
+        elif op == MUL:
+            regs[a] = regs[b] * regs[c]
+        else:
+            regs[a] = regs[b] * c
+
+    return SimulationResult(
+        cycles=cycles,
+        instructions=len(program),
+        memory_reads=reads,
+        memory_writes=writes,
+        registers_used=len(regs),
+        max_live_registers=_max_live(program),
+        memory=mem,
+    )
+
+
+def _simulate_stack(
+    program: AssemblyProgram, mem: dict[str, int], costs: list[int]
+) -> SimulationResult:
+    # The stack has no registers; its peak depth is reported as the live count.
+    names = program.names
+    stack: list[int] = []
+    cycles = reads = writes = peak = 0
+    for op, a in zip(program.ops, program.a):
+        cycles += costs[op]
+        if op == PUSH:
+            name = names[a]
+            if name not in mem:
+                raise ValueError(f"Load from uninitialized memory: {name}")
+            stack.append(mem[name])
+            reads += 1
+            peak = max(peak, len(stack))
+        elif op == PUSHI:
+            stack.append(a)
+            peak = max(peak, len(stack))
+        elif op == POP:
+            mem[names[a]] = stack.pop()
+            writes += 1
+        elif op == ADD:
+            right = stack.pop()
+            stack[-1] += right
+        else:
+            right = stack.pop()
+            stack[-1] *= right
+
+    return SimulationResult(
+        cycles=cycles,
+        instructions=len(program),
+        memory_reads=reads,
+        memory_writes=writes,
+        registers_used=0,
+        max_live_registers=peak,
+        memory=mem,
+    )
+
+
+def _max_live(program: AssemblyProgram) -> int:
+    # A register is live from the instruction that loads it to its last read.
+    first_def: dict[int, int] = {}
+    last_use: dict[int, int] = {}
+    risc = program.target == Target.RISC
+    rows = zip(program.ops, program.a, program.b, program.c if risc else program.b)
+    for idx, (op, a, b, c) in enumerate(rows):
+        if op == STORE:
+            last_use[b] = idx
+            continue
+        if risc and op != LOAD and op != LOADI:
+            last_use[b] = idx
+            if op == ADD or op == MUL:
+                last_use[c] = idx
+            first_def.setdefault(a, idx)
+            continue
+        first_def.setdefault(a, idx)
+        if op != LOAD and op != LOADI:
+            last_use[a] = idx
+        if op == ADD or op == MUL:
+            last_use[b] = idx
+
+    events = [0] * (len(program) + 1)
+    for reg, start in first_def.items():
+        events[start] += 1
+        events[last_use.get(reg, start) + 1] -= 1
+    live = peak = 0
+    for delta in events:
+        live += delta
+        peak = max(peak, live)
+    return peak
+
+
+def compare(
+    result: CompilationResult,
+    memory: Mapping[str, int] | None = None,
+    model: CostModel | None = None,
+) -> SimulationComparison:
+    return SimulationComparison(
+        baseline=simulate(result.assembly, memory, model),
+        optimized=simulate(result.optimized_assembly, memory, model),
+    )
+
+
+def compare_targets(
+    tac: TACProgram,
+    targets: Iterable[Target | str] = tuple(Target),
+    memory: Mapping[str, int] | None = None,
+    model: CostModel | None = None,
+) -> dict[Target, SimulationResult]:
+    # Each target is generated from the same TAC, so code size and cycles compare
+    # machine models rather than front-end output.
+    return {
+        Target(target): simulate(generate(tac, target=target), memory, model) for target in targets
+    }
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from . import ast
+from .tac import NONE, OP_ASSIGN, OPCODES, TACColumns, TempFactory
+
+DEFAULT_MEMO_SIZE = 1024
+
+
+@dataclass(frozen=True)
+class MemoStats:
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+@dataclass(frozen=True)
+class Template:
+    # TAC of one expression shape, stored by column. Operands index an environment
+    # laid out as [NONE, names..., constants..., temps...] that each instantiation
+    # fills in; the opcode column is copied as is.
+    ops: array
+    arg1: tuple[int, ...]
+    arg2: tuple[int, ...]
+    result: tuple[int, ...]
+    temps: int
+    value: int
+
+
+class ShapeCache:
+    # Statement lowering memoized on the expression's shape: operators and leaf
+    # kinds in prefix order, with variables alpha-renamed by first occurrence and
+    # literal values abstracted. `x * 2 + x` and `y * 7 + y` share one template.
+    # One cache may serve concurrent compilations: lookups and updates hold a
+    # lock, templates are immutable and are instantiated outside it.
+    def __init__(self, maxsize: int = DEFAULT_MEMO_SIZE) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._templates: OrderedDict[tuple, Template] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def stats(self) -> MemoStats:
+        with self._lock:
+            return MemoStats(self.hits, self.misses, self.evictions, len(self._templates))
+
+    def lower(self, expr: ast.Expr, target: str, cols: TACColumns, temps: TempFactory) -> None:
+        key, names, consts = shape(expr)
+        with self._lock:
+            template = self._templates.get(key)
+            if template is None:
+                self.misses += 1
+                template = _build(expr, names, len(consts))
+                self._templates[key] = template
+                if len(self._templates) > self.maxsize:
+                    self._templates.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self.hits += 1
+                self._templates.move_to_end(key)
+
+        env = [NONE]
+        env.extend(map(cols.name, names))
+        env.extend(map(cols.const, consts))
+        env.extend(cols.temps(temps.reserve(template.temps), template.temps))
+        lookup = env.__getitem__
+        cols.ops.extend(template.ops)
+        cols.arg1.extend(map(lookup, template.arg1))
+        cols.arg2.extend(map(lookup, template.arg2))
+        cols.result.extend(map(lookup, template.result))
+        cols.append(OP_ASSIGN, env[template.value], NONE, cols.name(target))
+
+
+def shape(expr: ast.Expr) -> tuple[tuple, list[str], list[int]]:
+    key: list[str | int | None] = []
+    names: dict[str, int] = {}
+    consts: list[int] = []
+    stack = [expr]
+    pop, push, emit = stack.pop, stack.append, key.append
+    while stack:
+        node = pop()
+        kind = type(node)
+        if kind is ast.BinaryExpr:
+            emit(node.op.value)  # type: ignore[attr-defined]
+            push(node.right)  # type: ignore[attr-defined]
+            push(node.left)  # type: ignore[attr-defined]
+        elif kind is ast.Identifier:
+            emit(names.setdefault(node.name, len(names)))  # type: ignore[attr-defined]
+        elif kind is ast.Literal:
+            emit(None)
+            consts.append(node.value)  # type: ignore[attr-defined]
+        else:
+            raise TypeError(f"Unsupported expr type: {kind}")
+    return tuple(key), list(names), consts
+
+
+def _build(expr: ast.Expr, names: list[str], consts: int) -> Template:
+    # Same post-order as tac._emit_expr; leaves are met in the same left-to-right
+    # order as in `shape`, so the k-th literal is constant parameter k.
+    rows: list[tuple[int, int, int, int]] = []
+    index = {name: 1 + i for i, name in enumerate(names)}
+    first_const = 1 + len(names)
+    first_temp = first_const + consts
+    next_const = first_const
+    temps = 0
+
+    def emit(node: ast.Expr) -> int:
+        nonlocal next_const, temps
+        if isinstance(node, ast.Literal):
+            next_const += 1
+            return next_const - 1
+        if isinstance(node, ast.Identifier):
+            return index[node.name]
+        left = emit(node.left)  # type: ignore[attr-defined]
+        right = emit(node.right)  # type: ignore[attr-defined]
+        temp = first_temp + temps
+        temps += 1
+        rows.append((OPCODES[node.op.value], left, right, temp))  # type: ignore[attr-defined]
+        return temp
+
+    value = emit(expr)
+    return Template(
+        array("B", [row[0] for row in rows]),
+        tuple(row[1] for row in rows),
+        tuple(row[2] for row in rows),
+        tuple(row[3] for row in rows),
+        temps,
+        value,
+    )
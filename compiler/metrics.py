@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import sys
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, TypeVar
+
+if TYPE_CHECKING:
+    from .ast import Program
+    from .codegen import AssemblyProgram
+    from .diagnostics import Diagnostic
+    from .lexer import Token
+    from .memo import MemoStats
+    from .optimizer import OptimizationResult
+    from .tac import TACProgram
+
+T = TypeVar("T")
+
+PROFILE_LIMIT = 25
+OPTIMIZED_CODEGEN = "optimized_codegen"
+DEPENDENCIES = "dependencies"
+
+
+@dataclass(frozen=True)
+class PhaseMetrics:
+    name: str
+    seconds: float
+    allocated_blocks: int
+    peak_bytes: int | None = None
+
+
+@dataclass(frozen=True)
+class CompilationMetrics:
+    phases: list[PhaseMetrics] = field(default_factory=list)
+    counters: dict[str, int] = field(default_factory=dict)
+    profile: str | None = None
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(p.seconds for p in self.phases)
+
+    def phase(self, name: str) -> PhaseMetrics | None:
+        for metrics in self.phases:
+            if metrics.name == name:
+                return metrics
+        return None
+
+
+class MetricsRecorder:
+    def __init__(self, profile: bool = False) -> None:
+        self._phases: list[PhaseMetrics] = []
+        self._counters: dict[str, int] = {}
+        self._profiler = None
+        self._owns_tracemalloc = False
+        if profile:
+            import cProfile
+            import tracemalloc
+
+            self._profiler = cProfile.Profile()
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._owns_tracemalloc = True
+
+    def run(self, name: str, fn: Callable[..., T], *args, **kwargs) -> T:
+        profiler = self._profiler
+        baseline = 0
+        if profiler is not None:
+            import tracemalloc
+
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            elapsed = time.perf_counter() - start
+            allocated = sys.getallocatedblocks() - blocks
+            peak = None
+            if profiler is not None:
+                peak = tracemalloc.get_traced_memory()[1] - baseline
+            self.add(name, elapsed, allocated, peak)
+
+    def add(
+        self, name: str, seconds: float, allocated_blocks: int = 0, peak_bytes: int | None = None
+    ) -> None:
+        self._phases.append(PhaseMetrics(name, seconds, allocated_blocks, peak_bytes))
+
+    def count(self, name: str, value: int) -> None:
+        self._counters[name] = self._counters.get(name, 0) + value
+
+    def finish(self) -> CompilationMetrics:
+        profile = None
+        if self._profiler is not None:
+            profile = _format_profile(self._profiler)
+            self._profiler = None
+            if self._owns_tracemalloc:
+                import tracemalloc
+
+                tracemalloc.stop()
+                self._owns_tracemalloc = False
+        return CompilationMetrics(
+            phases=list(self._phases), counters=dict(self._counters), profile=profile
+        )
+
+
+def _format_profile(profiler) -> str:
+    import io
+    import pstats
+
+    buffer = io.StringIO()
+    stats = pstats.Stats(profiler, stream=buffer)
+    stats.sort_stats("cumulative").print_stats(PROFILE_LIMIT)
+    return buffer.getvalue().strip()
+
+
+def record_counters(
+    recorder: MetricsRecorder,
+    *,
+    tokens: list[Token] | None = None,
+    program: Program | None = None,
+    tac: TACProgram | None = None,
+    assembly: AssemblyProgram | None = None,
+    optimized_tac: OptimizationResult | None = None,
+    optimized_assembly: AssemblyProgram | None = None,
+    diagnostics: list[Diagnostic] | None = None,
+) -> None:
+    if tokens is not None:
+        recorder.count("tokens", len(tokens) - 1)
+    if program is not None:
+        from .ast import count_nodes
+
+        recorder.count("statements", len(program.statements))
+        recorder.count("ast_nodes", count_nodes(program))
+    if tac is not None:
+        recorder.count("tac_instructions", len(tac))
+    if assembly is not None:
+        recorder.count("assembly_instructions", len(assembly))
+        recorder.count("registers", assembly.registers)
+    if optimized_tac is not None:
+        recorder.count("optimized_tac_instructions", len(optimized_tac.program))
+        recorder.count("optimizer_rewrites", len(optimized_tac.explanations))
+    if optimized_assembly is not None:
+        recorder.count("optimized_assembly_instructions", len(optimized_assembly))
+        recorder.count("optimized_registers", optimized_assembly.registers)
+    if diagnostics is not None:
+        recorder.count("diagnostics", len(diagnostics))
+
+
+def record_memo(recorder: MetricsRecorder, before: MemoStats | None, after: MemoStats) -> None:
+    # The cache may be shared across compilations; only this run's lookups count.
+    hits = after.hits - (before.hits if before else 0)
+    misses = after.misses - (before.misses if before else 0)
+    recorder.count("memo_hits", hits)
+    recorder.count("memo_misses", misses)
+    recorder.count("memo_evictions", after.evictions - (before.evictions if before else 0))
+    recorder.count("memo_hit_rate_pct", round(100 * hits / (hits + misses)) if hits else 0)
@@ -1,8 +1,28 @@
 from __future__ import annotations
 
+import threading
 from dataclasses import dataclass
 
-from .tac import TACInstr, TACProgram
+from .tac import (
+    CONST,
+    NONE,
+    OP_ASSIGN,
+    OP_NAMES,
+    OP_NOP,
+    TEMP,
+    VAR,
+    TACColumns,
+    TACProgram,
+)
+
+# Same-op folds on one dependency level are evaluated together; groups at least this
+# large go through NumPy when it is installed and every operand fits the safe range.
+NUMPY_BATCH_MIN = 256
+_INT64_ADD_LIMIT = 1 << 62
+_INT64_MUL_LIMIT = 1 << 31
+
+_numpy = None
+_numpy_lock = threading.Lock()
 
 
 @dataclass(frozen=True)
@@ -12,74 +32,214 @@ class OptimizationResult:
 
 
 def optimize(tac: TACProgram) -> OptimizationResult:
-    explanations: list[str] = []
-    instructions = list(tac.instructions)
+    cols = tac.columns.copy()
+    explanations = optimize_columns(cols)
+    return OptimizationResult(
+        program=TACProgram(shared=tac.shared, columns=cols), explanations=explanations
+    )
+
+
+def optimize_columns(cols: TACColumns) -> list[str]:
+    # Every pass rewrites `cols` in place; deleted rows are dropped once at the end.
+    explanations = _constant_propagation(cols, None)
+    explanations.extend(_copy_propagation(cols))
+    cols.compact()
+    return explanations
+
+
+class SliceOptimizer:
+    # Optimizes a program one slice of whole statements at a time, with the same
+    # rows and explanations as optimize_columns on the whole. Only the variables
+    # known to hold a constant carry over between slices; temps never outlive a
+    # statement, so copy propagation needs no state.
+    def __init__(self) -> None:
+        self.constants: dict[str, int] = {}
+        self._folds: list[str] = []
+        self._copies: list[str] = []
+
+    def run(self, cols: TACColumns) -> None:
+        self._folds.extend(_constant_propagation(cols, self.constants))
+        self._copies.extend(_copy_propagation(cols))
+        cols.compact()
+
+    def explanations(self) -> list[str]:
+        return self._folds + self._copies
+
+
+def _constant_propagation(cols: TACColumns, constants: dict[str, int] | None) -> list[str]:
+    # Pass 1 walks the program once and records which names hold known constants as
+    # slots in `values`; folds are only scheduled here, by dependency level.
+    values: list[int | None] = []
+    levels: list[int] = []
+    known = [-1] * len(cols.names)
+    literal_slots = [-1] * len(cols.consts)
+    pending: dict[tuple[int, int], list[tuple[int, int, int]]] = {}
+    plan: list[tuple[int, int, int]] = []
+
+    def operand(arg: int) -> int:
+        tag = arg & 3
+        if tag == CONST:
+            slot = literal_slots[arg >> 2]
+            if slot < 0:
+                slot = literal_slots[arg >> 2] = len(values)
+                values.append(cols.consts[arg >> 2])
+                levels.append(0)
+            return slot
+        if tag == NONE:
+            return -1
+        return known[arg >> 2]
+
+    if constants:
+        for idx, name in enumerate(cols.names):
+            value = constants.get(name)
+            if value is not None:
+                known[idx] = len(values)
+                values.append(value)
+                levels.append(0)
+
+    for op, x, y, r in cols.rows():
+        a = operand(x)
+        if op == OP_ASSIGN:
+            known[r >> 2] = a
+            plan.append((a, -1, a))
+            continue
 
-    instructions, fold_explanations = _constant_folding(instructions)
-    explanations.extend(fold_explanations)
+        b = operand(y)
+        if a >= 0 and b >= 0:
+            slot = len(values)
+            values.append(None)
+            level = max(levels[a], levels[b]) + 1
+            levels.append(level)
+            pending.setdefault((level, op), []).append((slot, a, b))
+            known[r >> 2] = slot
+            plan.append((a, b, slot))
+            continue
 
-    instructions, copy_explanations = _copy_propagation(instructions)
-    explanations.extend(copy_explanations)
+        known[r >> 2] = -1
+        plan.append((a, b, -1))
 
-    return OptimizationResult(program=TACProgram(instructions), explanations=explanations)
+    for level, op in sorted(pending):
+        _fold_batch(OP_NAMES[op], pending[(level, op)], values)
 
+    if constants is not None:
+        for r in set(cols.result):
+            if r & 3 == VAR:
+                slot = known[r >> 2]
+                if slot >= 0:
+                    constants[cols.names[r >> 2]] = values[slot]  # type: ignore[assignment]
+                else:
+                    constants.pop(cols.names[r >> 2], None)
 
-def _constant_folding(instructions: list[TACInstr]) -> tuple[list[TACInstr], list[str]]:
-    optimized: list[TACInstr] = []
+    # Pass 2 rewrites the rows in place with the computed values.
+    ops, arg1, arg2, result, names = cols.ops, cols.arg1, cols.arg2, cols.result, cols.names
+    const = cols.const
     explanations: list[str] = []
-    for instr in instructions:
-        if instr.op in {"+", "*"} and isinstance(instr.arg1, int) and isinstance(instr.arg2, int):
-            value = instr.arg1 + instr.arg2 if instr.op == "+" else instr.arg1 * instr.arg2
-            optimized.append(TACInstr("ASSIGN", value, None, instr.result))
-            explanations.append(
-                f"Constant folding: {instr.arg1} {instr.op} {instr.arg2} -> {value}"
-            )
+    for i, (a, b, slot) in enumerate(plan):
+        x, y = arg1[i], arg2[i]
+        if a >= 0 and x & 3 == VAR:
+            explanations.append(f"Constant propagation: {names[x >> 2]} -> {values[a]}")
+        if b >= 0 and y & 3 == VAR:
+            explanations.append(f"Constant propagation: {names[y >> 2]} -> {values[b]}")
+
+        op = ops[i]
+        if slot >= 0:
+            if op != OP_ASSIGN:
+                explanations.append(
+                    f"Constant folding: {values[a]} {OP_NAMES[op]} {values[b]} -> {values[slot]}"
+                )
+            if result[i] & 3 == TEMP:
+                ops[i] = OP_NOP
+            else:
+                ops[i] = OP_ASSIGN
+                arg1[i] = const(values[slot])  # type: ignore[arg-type]
+                arg2[i] = NONE
+            continue
+
+        if a >= 0:
+            x = arg1[i] = const(values[a])  # type: ignore[arg-type]
+        if b >= 0:
+            y = arg2[i] = const(values[b])  # type: ignore[arg-type]
+        if op != OP_ASSIGN and x & 3 == CONST and y & 3 != CONST:
+            # Both ops commute; keeping the literal on the right enables ADDI/MULI.
+            arg1[i], arg2[i] = y, x
+
+    return explanations
+
+
+def _fold_batch(op: str, folds: list[tuple[int, int, int]], values: list[int | None]) -> None:
+    lefts = [values[a] for _, a, _ in folds]
+    rights = [values[b] for _, _, b in folds]
+    results = None
+    if len(folds) >= NUMPY_BATCH_MIN:
+        results = _fold_numpy(op, lefts, rights)  # type: ignore[arg-type]
+    if results is None:
+        if op == "+":
+            results = [x + y for x, y in zip(lefts, rights)]  # type: ignore[operator]
         else:
-            optimized.append(instr)
-    return optimized, explanations
-
-
-def _copy_propagation(instructions: list[TACInstr]) -> tuple[list[TACInstr], list[str]]:
-    uses: dict[str, int] = {}
-    defs: dict[str, int] = {}
-
-    def count_use(arg: str | int | None) -> None:
-        if isinstance(arg, str) and arg.startswith("t"):
-            uses[arg] = uses.get(arg, 0) + 1
-
-    for idx, instr in enumerate(instructions):
-        if instr.op in {"+", "*"}:
-            count_use(instr.arg1)
-            count_use(instr.arg2)
-            if instr.result.startswith("t"):
-                defs[instr.result] = idx
-        elif instr.op == "ASSIGN":
-            count_use(instr.arg1)
-            if instr.result.startswith("t"):
-                defs[instr.result] = idx
-
-    optimized = list(instructions)
-    explanations: list[str] = []
+            results = [x * y for x, y in zip(lefts, rights)]  # type: ignore[operator]
+    for (slot, _, _), value in zip(folds, results):
+        values[slot] = value
+
+
+def _fold_numpy(op: str, lefts: list[int], rights: list[int]) -> list[int] | None:
+    np = _load_numpy()
+    if np is None:
+        return None
+    limit = _INT64_ADD_LIMIT if op == "+" else _INT64_MUL_LIMIT
+    # Exact Python ints are kept whenever an int64 result could overflow.
+    if any(not -limit < v < limit for v in lefts) or any(not -limit < v < limit for v in rights):
+        return None
+    left = np.array(lefts, dtype=np.int64)
+    right = np.array(rights, dtype=np.int64)
+    return (left + right if op == "+" else left * right).tolist()
+
+
+def _load_numpy():
+    global _numpy
+    if _numpy is None:
+        with _numpy_lock:
+            if _numpy is None:
+                try:
+                    import numpy
+                except ImportError:
+                    _numpy = False
+                else:
+                    _numpy = numpy
+    return _numpy or None
+
+
+def _copy_propagation(cols: TACColumns) -> list[str]:
+    ops, arg1, result, names = cols.ops, cols.arg1, cols.result, cols.names
+    uses = [0] * len(names)
+    for op, x, y, _ in cols.rows():
+        if op == OP_NOP:
+            continue
+        if x & 3 == TEMP:
+            uses[x >> 2] += 1
+        if y & 3 == TEMP:
+            uses[y >> 2] += 1
 
-    i = 0
-    while i < len(optimized) - 1:
-        current = optimized[i]
-        next_instr = optimized[i + 1]
+    # A single-use temp copied right after the instruction that computes it is
+    # written directly to the copy's target; the copy row is deleted.
+    explanations: list[str] = []
+    current = -1
+    for i, op in enumerate(ops):
+        if op == OP_NOP:
+            continue
+        x = arg1[i]
         if (
-            next_instr.op == "ASSIGN"
-            and isinstance(next_instr.arg1, str)
-            and next_instr.arg1.startswith("t")
-            and uses.get(next_instr.arg1, 0) == 1
-            and defs.get(next_instr.arg1) == i
+            current >= 0
+            and op == OP_ASSIGN
+            and x & 3 == TEMP
+            and uses[x >> 2] == 1
+            and result[current] == x
         ):
-            optimized[i] = TACInstr(
-                current.op, current.arg1, current.arg2, next_instr.result
-            )
+            result[current] = result[i]
+            ops[i] = OP_NOP
             explanations.append(
-                f"Eliminated temp {next_instr.arg1} by writing directly to {next_instr.result}"
+                f"Eliminated temp {names[x >> 2]} by writing directly to {names[result[i] >> 2]}"
             )
-            optimized.pop(i + 1)
             continue
-        i += 1
+        current = i
 
-    return optimized, explanations
+    return explanations
@@ -1,17 +1,47 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import sys
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
 
 from . import ast
-from .diagnostics import Diagnostic, Phase, Span, diag
+from .diagnostics import Diagnostic, DiagnosticSink, Phase, Span, diag
 from .lexer import Token, TokenType
 
+if TYPE_CHECKING:
+    from .budget import BudgetMeter
+
+# Nodes built between two budget checks while parsing.
+CHECK_INTERVAL = 1024
+
 
 @dataclass
 class ParserState:
     tokens: list[Token]
     index: int = 0
-    diagnostics: list[Diagnostic] | None = None
+    sink: DiagnosticSink = field(default_factory=DiagnosticSink)
+    # Panic mode: after an error, further errors are dropped until the parser
+    # resynchronizes on the next ';'.
+    panic: bool = False
+    interner: ast.Interner | None = None
+    # Budget metering: nodes built so far, counted as ast.count_nodes counts them,
+    # and open parentheses. With a meter, usage is reported every CHECK_INTERVAL
+    # nodes and whenever the nesting passes the meter's limit, so one huge or
+    # deeply nested statement is stopped while it is being parsed.
+    meter: BudgetMeter | None = None
+    nodes: int = 0
+    depth: int = 0
+    max_depth: int = sys.maxsize
+    _next_check: int = sys.maxsize
+    _base_nodes: int = 0
+    _semicolons: list[int] | None = None
+
+    def __post_init__(self) -> None:
+        if self.meter is not None:
+            self.max_depth = self.meter.max_nesting
+            self._next_check = CHECK_INTERVAL
+            self._base_nodes = self.meter.nodes
 
     def current(self) -> Token:
         return self.tokens[self.index]
@@ -31,44 +61,85 @@ class ParserState:
         token = self.current()
         if token.type == token_type:
             return self.advance()
-        self.diagnostics.append(
-            diag(Phase.PARSER, code, message, token.span)
-        )
+        self.error(code, message, token.span)
         return token
 
+    def error(self, code: str, message: str, span: Span) -> None:
+        if not self.panic:
+            self.sink.report(diag(Phase.PARSER, code, message, span))
+        self.panic = True
+
+    def skip_to_semicolon(self) -> None:
+        # Recovery jumps through an index of ';' positions, built on the first
+        # error, instead of stepping over every token of a bad region.
+        if self._semicolons is None:
+            self._semicolons = [
+                idx for idx, token in enumerate(self.tokens) if token.type == TokenType.SEMICOLON
+            ]
+        pos = bisect_left(self._semicolons, self.index)
+        if pos < len(self._semicolons):
+            self.index = self._semicolons[pos]
+        else:
+            self.index = len(self.tokens) - 1
+
+    def check_budget(self) -> None:
+        meter = self.meter
+        if meter is None:
+            return
+        self._next_check = self.nodes + CHECK_INTERVAL
+        meter.nodes = self._base_nodes + self.nodes
+        meter.nesting = max(meter.nesting, self.depth)
+        meter.check(Phase.PARSER, self.current().span)
+
     def synchronize(self) -> None:
-        while self.current().type not in (TokenType.SEMICOLON, TokenType.EOF):
-            self.advance()
+        self.skip_to_semicolon()
         if self.current().type == TokenType.SEMICOLON:
             self.advance()
-
-
-def parse(tokens: list[Token]) -> tuple[ast.Program, list[Diagnostic]]:
-    diagnostics: list[Diagnostic] = []
-    state = ParserState(tokens=tokens, diagnostics=diagnostics)
+        self.panic = False
+
+
+def parse(
+    tokens: list[Token],
+    sink: DiagnosticSink | None = None,
+    *,
+    hash_cons: bool = False,
+    meter: BudgetMeter | None = None,
+) -> tuple[ast.Program, list[Diagnostic]]:
+    # With a meter, BudgetExceeded may be raised mid-parse; the meter's node count
+    # includes the returned program otherwise.
+    interner = ast.Interner() if hash_cons else None
+    state = ParserState(
+        tokens=tokens, sink=sink or DiagnosticSink(), interner=interner, meter=meter
+    )
+    state.nodes = 1
     statements: list[ast.Declaration] = []
 
     while state.current().type != TokenType.EOF:
         decl = parse_declaration(state)
-        if decl is not None:
-            statements.append(decl)
+        if decl is None:
+            # Already resynchronized past the statement's ';'.
+            continue
+        statements.append(decl)
         if state.current().type == TokenType.SEMICOLON:
             state.advance()
+            state.panic = False
         elif state.current().type != TokenType.EOF:
-            diagnostics.append(
-                diag(Phase.PARSER, "PAR001", "Expected ';' after statement", state.current().span)
-            )
+            state.error("PAR001", "Expected ';' after statement", state.current().span)
             state.synchronize()
 
-    return ast.Program(statements=statements), diagnostics
+    if meter is not None:
+        meter.nodes = state._base_nodes + state.nodes
+    span_table = interner.spans if interner is not None else None
+    return (
+        ast.Program(statements=statements, span_table=span_table),
+        state.sink.finish(Phase.PARSER),
+    )
 
 
 def parse_declaration(state: ParserState) -> ast.Declaration | None:
     token = state.current()
     if token.type != TokenType.KEYWORD_INT:
-        state.diagnostics.append(
-            diag(Phase.PARSER, "PAR002", "Expected type declaration", token.span)
-        )
+        state.error("PAR002", "Expected type declaration", token.span)
         state.synchronize()
         return None
 
@@ -79,6 +150,9 @@ def parse_declaration(state: ParserState) -> ast.Declaration | None:
     state.expect(TokenType.ASSIGN, "PAR004", "Expected '=' after identifier")
     value = parse_expr(state)
     assignment = ast.Assign(target=target, value=value, span=target.span)
+    state.nodes += 3
+    if state.nodes >= state._next_check:
+        state.check_budget()
     return ast.Declaration(type_name=ast.TypeName.INT, assignment=assignment, span=token.span)
 
 
@@ -87,12 +161,7 @@ def parse_expr(state: ParserState) -> ast.Expr:
     while state.current().type == TokenType.PLUS:
         op_token = state.advance()
         right = parse_term(state)
-        expr = ast.BinaryExpr(
-            op=ast.BinOp.ADD,
-            left=expr,
-            right=right,
-            span=op_token.span,
-        )
+        expr = _binary(state, ast.BinOp.ADD, expr, right, op_token.span)
     return expr
 
 
@@ -101,31 +170,49 @@ def parse_term(state: ParserState) -> ast.Expr:
     while state.current().type == TokenType.MULTIPLY:
         op_token = state.advance()
         right = parse_factor(state)
-        expr = ast.BinaryExpr(
-            op=ast.BinOp.MUL,
-            left=expr,
-            right=right,
-            span=op_token.span,
-        )
+        expr = _binary(state, ast.BinOp.MUL, expr, right, op_token.span)
     return expr
 
 
 def parse_factor(state: ParserState) -> ast.Expr:
     token = state.current()
+    interner = state.interner
     if token.type == TokenType.IDENTIFIER:
         state.advance()
+        state.nodes += 1
+        if interner is not None:
+            return interner.identifier(token.lexeme, token.span)
         return ast.Identifier(name=token.lexeme, span=token.span)
     if token.type == TokenType.INTEGER_LITERAL:
         state.advance()
+        state.nodes += 1
+        if interner is not None:
+            return interner.literal(token.literal or 0, token.span)
         return ast.Literal(value=token.literal or 0, span=token.span)
     if token.type == TokenType.LPAREN:
         state.advance()
+        state.depth += 1
+        if state.depth > state.max_depth:
+            state.check_budget()
         expr = parse_expr(state)
+        state.depth -= 1
         state.expect(TokenType.RPAREN, "PAR005", "Expected ')' after expression")
         return expr
 
-    state.diagnostics.append(
-        diag(Phase.PARSER, "PAR006", "Expected expression", token.span)
-    )
-    state.advance()
+    state.error("PAR006", "Expected expression", token.span)
+    state.skip_to_semicolon()
+    state.nodes += 1
+    if interner is not None:
+        return interner.literal(0, token.span)
     return ast.Literal(value=0, span=token.span)
+
+
+def _binary(
+    state: ParserState, op: ast.BinOp, left: ast.Expr, right: ast.Expr, span: Span
+) -> ast.Expr:
+    state.nodes += 1
+    if state.nodes >= state._next_check:
+        state.check_budget()
+    if state.interner is not None:
+        return state.interner.binary(op, left, right, span)
+    return ast.BinaryExpr(op=op, left=left, right=right, span=span)
@@ -1,15 +1,49 @@
 from __future__ import annotations
 
+import re
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import partial
+from mmap import mmap
+from queue import Queue
+from typing import Any
 
-from .ast import Program
-from .codegen import AssemblyProgram, generate as generate_asm
-from .diagnostics import Diagnostic
-from .lexer import Token, lex
-from .optimizer import OptimizationResult, optimize
+from .ast import Declaration, Program, SpanTable, expression_depth
+from .budget import Budget, BudgetExceeded, BudgetMeter, too_deep
+from .codegen import TARGETS, AssemblyProgram, Emitter, Target
+from .codegen import generate as generate_asm
+from .depgraph import select
+from .diagnostics import Diagnostic, DiagnosticLimits, DiagnosticSink, Phase, SourceMap, Span
+from .lexer import Token, TokenType, lex, lex_range
+from .memo import MemoStats, ShapeCache
+from .metrics import (
+    DEPENDENCIES,
+    OPTIMIZED_CODEGEN,
+    CompilationMetrics,
+    MetricsRecorder,
+    record_counters,
+    record_memo,
+)
+from .optimizer import OptimizationResult, SliceOptimizer, optimize
 from .parser import parse
-from .semantic import SemanticResult, analyze
-from .tac import TACProgram, generate as generate_tac
+from .semantic import SemanticResult, SymbolTable, analyze
+from .tac import TACColumns, TACProgram, TempFactory
+from .tac import generate as generate_tac
+
+# Pipelined mode: statements per work item, and work items a stage may run ahead
+# of the next one before it blocks.
+DEFAULT_BATCH = 256
+DEFAULT_QUEUE_SIZE = 4
+# Budgeted mode: characters lexed between two budget checks within a slice.
+LEX_PIECE = 1 << 16
+_DIAGNOSED_PHASES = (Phase.LEXER, Phase.PARSER, Phase.SEMANTIC)
+_DONE = object()
+# A piece may end after whitespace or punctuation: no token or bad run spans either.
+_TEXT_CUT = re.compile(r"[\s=+*;()]")
+_BYTES_CUT = re.compile(rb"[\s=+*;()]")
 
 
 @dataclass(frozen=True)
@@ -22,18 +56,67 @@ class CompilationResult:
     optimized_tac: OptimizationResult
     optimized_assembly: AssemblyProgram
     diagnostics: list[Diagnostic]
+    metrics: CompilationMetrics | None = None
+    # The BUD diagnostic of an exceeded budget; the other fields then hold what
+    # was compiled up to that point.
+    stopped: Diagnostic | None = None
 
 
-def compile_source(source: str) -> CompilationResult:
-    tokens, lex_diags = lex(source)
-    program, parse_diags = parse(tokens)
-    semantic = analyze(program)
-    tac = generate_tac(program)
-    assembly = generate_asm(tac)
-    optimized_tac = optimize(tac)
-    optimized_assembly = generate_asm(optimized_tac.program)
+def compile_source(
+    source: str | bytes | mmap,
+    *,
+    profile: bool = False,
+    limits: DiagnosticLimits | None = None,
+    hash_cons: bool = False,
+    outputs: Iterable[str] | None = None,
+    schedule: bool = False,
+    target: Target | str = Target.ACCUMULATOR,
+    memo: ShapeCache | None = None,
+    budget: Budget | None = None,
+) -> CompilationResult:
+    if budget is not None:
+        return _compile_budgeted(
+            source,
+            budget,
+            profile=profile,
+            limits=limits,
+            hash_cons=hash_cons,
+            outputs=outputs,
+            schedule=schedule,
+            target=target,
+            memo=memo,
+        )
+    recorder = MetricsRecorder(profile=profile)
+    sink = DiagnosticSink(limits)
+    tokens, _ = recorder.run(Phase.LEXER.value, lex, source, sink)
+    program, _ = recorder.run(Phase.PARSER.value, parse, tokens, sink, hash_cons=hash_cons)
+    semantic = recorder.run(Phase.SEMANTIC.value, analyze, program, sink)
+    lowered = program
+    if outputs is not None or schedule:
+        # Only the declarations the outputs need are lowered, in schedule order;
+        # the result keeps the full AST and its diagnostics.
+        lowered = recorder.run(DEPENDENCIES, select, program, outputs, schedule)
+    before = memo.stats() if memo is not None else None
+    tac = recorder.run(Phase.TAC.value, generate_tac, lowered, memo=memo)
+    assembly = recorder.run(Phase.CODEGEN.value, generate_asm, tac, target=target)
+    optimized_tac = recorder.run(Phase.OPTIMIZER.value, optimize, tac)
+    optimized_assembly = recorder.run(
+        OPTIMIZED_CODEGEN, generate_asm, optimized_tac.program, target=target
+    )
 
-    diagnostics = lex_diags + parse_diags + semantic.diagnostics
+    diagnostics = sink.finish()
+    record_counters(
+        recorder,
+        tokens=tokens,
+        program=program,
+        tac=tac,
+        assembly=assembly,
+        optimized_tac=optimized_tac,
+        optimized_assembly=optimized_assembly,
+        diagnostics=diagnostics,
+    )
+    if memo is not None:
+        record_memo(recorder, before, memo.stats())
 
     return CompilationResult(
         tokens=tokens,
@@ -44,4 +127,393 @@ def compile_source(source: str) -> CompilationResult:
         optimized_tac=optimized_tac,
         optimized_assembly=optimized_assembly,
         diagnostics=diagnostics,
+        metrics=recorder.finish(),
     )
+
+
+def compile_pipelined(
+    source: str | bytes | mmap,
+    *,
+    limits: DiagnosticLimits | None = None,
+    target: Target | str = Target.ACCUMULATOR,
+    memo: ShapeCache | None = None,
+    batch: int = DEFAULT_BATCH,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+) -> CompilationResult:
+    # Same result as compile_source, with each phase in its own thread. Work items
+    # are slices of `batch` statements cut after a ';' and passed on through
+    # queues of `queue_size` items, so a fast stage blocks instead of buffering
+    # the whole program.
+    if batch < 1 or queue_size < 1:
+        raise ValueError("batch and queue_size must be positive")
+    recorder = MetricsRecorder()
+    state = _SliceCompiler(source, limits, target, memo)
+    before = memo.stats() if memo is not None else None
+
+    queues: list[Queue[Any]] = [Queue(queue_size) for _ in range(6)]
+    tokens_q, parsed_q, checked_q, lowered_q, opt_q, optimized_q = queues
+    stages = [
+        _Stage(Phase.LEXER.value, state.lex, _slices(source, batch), [tokens_q]),
+        _Stage(Phase.PARSER.value, state.parse, _drain(tokens_q), [parsed_q, checked_q]),
+        _Stage(Phase.SEMANTIC.value, state.analyze, _drain(checked_q), []),
+        _Stage(Phase.TAC.value, state.lower, _drain(parsed_q), [lowered_q, opt_q]),
+        _Stage(Phase.CODEGEN.value, state.asm.lower_program, _drain(lowered_q), []),
+        _Stage(Phase.OPTIMIZER.value, state.optimize, _drain(opt_q), [optimized_q]),
+        _Stage(OPTIMIZED_CODEGEN, state.optimized_asm.lower_program, _drain(optimized_q), []),
+    ]
+    for stage in stages:
+        stage.start()
+    for stage in stages:
+        stage.join()
+    for stage in stages:
+        if stage.error is not None:
+            raise stage.error
+        recorder.add(stage.name, stage.seconds)
+    return state.result(recorder, before)
+
+
+def _compile_budgeted(
+    source: str | bytes | mmap,
+    budget: Budget,
+    *,
+    profile: bool,
+    limits: DiagnosticLimits | None,
+    hash_cons: bool,
+    outputs: Iterable[str] | None,
+    schedule: bool,
+    target: Target | str,
+    memo: ShapeCache | None,
+    batch: int = DEFAULT_BATCH,
+) -> CompilationResult:
+    # The phases of compile_source in the same order, each run over slices of
+    # `batch` statements with a budget check after every slice. Whatever was
+    # compiled before a check fails is returned along with the BUD diagnostic.
+    # A hash-consed AST shares nodes between statements, so after lexing it is
+    # handled as a single slice.
+    recorder = MetricsRecorder(profile=profile)
+    meter = BudgetMeter(budget)
+    state = _SliceCompiler(source, limits, target, memo, hash_cons)
+    before = memo.stats() if memo is not None else None
+
+    def lex_all() -> list[list[Token]]:
+        chunks = []
+        for start, stop in _slices(source, batch):
+            chunk: list[Token] = []
+            for bounds in _pieces(source, start, stop):
+                chunk.extend(state.lex(bounds))
+                meter.tokens = len(state.tokens)
+                meter.diagnostics = state.reported()
+                meter.check(Phase.LEXER, Span(bounds[1], state.source_map))
+            chunks.append(chunk)
+        return chunks
+
+    def parse_all(units: list[list[Token]]) -> list[Program]:
+        # The parser meters nodes and parenthesis nesting itself; tree height is
+        # checked here, before the recursive phases walk the slice, when the
+        # budget limits it.
+        programs = []
+        for unit in units:
+            program = state.parse(unit, meter)
+            programs.append(program)
+            if budget.max_depth is not None:
+                meter.depth = max(meter.depth, expression_depth(program))
+            meter.diagnostics = state.reported()
+            meter.check(Phase.PARSER, _last_span(program))
+        return programs
+
+    def analyze_all(programs: list[Program]) -> None:
+        for program in programs:
+            state.analyze(program)
+            meter.diagnostics = state.reported()
+            meter.check(Phase.SEMANTIC, _last_span(program))
+
+    def lower_all(programs: list[Program]) -> list[TACProgram]:
+        chunks = []
+        for program in programs:
+            chunks.append(state.lower(program))
+            meter.tac = len(state.tac)
+            meter.check(Phase.TAC, _last_span(program))
+        return chunks
+
+    def codegen_all(asm: Emitter, chunks: list[TACProgram], phase: Phase) -> None:
+        for chunk in chunks:
+            asm.lower_program(chunk)
+            meter.assembly = state.asm.instruction_count() + state.optimized_asm.instruction_count()
+            meter.check(phase)
+
+    def optimize_all(chunks: list[TACProgram]) -> list[TACProgram]:
+        optimized = []
+        for chunk in chunks:
+            optimized.append(state.optimize(chunk))
+            meter.check(Phase.OPTIMIZER)
+        return optimized
+
+    def run(phase: Phase, name: str, fn: Callable[..., Any], *args: Any) -> Any:
+        # Trees too tall for the recursive phases stop the compile like a budget.
+        try:
+            return recorder.run(name, fn, *args)
+        except RecursionError:
+            raise too_deep(phase) from None
+
+    stopped = None
+    try:
+        meter.bytes = _byte_length(source)
+        meter.check(Phase.LEXER)
+        chunks = recorder.run(Phase.LEXER.value, lex_all)
+        units = [state.tokens] if hash_cons else chunks
+        programs = run(Phase.PARSER, Phase.PARSER.value, parse_all, units)
+        run(Phase.SEMANTIC, Phase.SEMANTIC.value, analyze_all, programs)
+        if outputs is not None or schedule:
+            program = Program(statements=state.statements, span_table=state.span_table)
+            lowered = run(Phase.SEMANTIC, DEPENDENCIES, select, program, outputs, schedule)
+            programs = [lowered]
+            if not hash_cons:
+                statements = lowered.statements
+                programs = [
+                    Program(statements=statements[i : i + batch])
+                    for i in range(0, len(statements), batch)
+                ]
+        tac = run(Phase.TAC, Phase.TAC.value, lower_all, programs)
+        run(Phase.CODEGEN, Phase.CODEGEN.value, codegen_all, state.asm, tac, Phase.CODEGEN)
+        optimized = run(Phase.OPTIMIZER, Phase.OPTIMIZER.value, optimize_all, tac)
+        run(
+            Phase.CODEGEN,
+            OPTIMIZED_CODEGEN,
+            codegen_all,
+            state.optimized_asm,
+            optimized,
+            Phase.CODEGEN,
+        )
+    except BudgetExceeded as exc:
+        stopped = exc.diagnostic
+    return state.result(recorder, before, stopped)
+
+
+class _SliceCompiler:
+    # Compiler state carried from one slice of whole statements to the next:
+    # symbol table, temp numbering, register bindings and known constants. Each
+    # phase reports into its own sink; replaying them in phase order gives the
+    # order and caps of the single sink compile_source uses.
+    def __init__(
+        self,
+        source: str | bytes | mmap,
+        limits: DiagnosticLimits | None,
+        target: Target | str,
+        memo: ShapeCache | None,
+        hash_cons: bool = False,
+    ) -> None:
+        self.source = source
+        self.source_map = SourceMap(source)
+        self.eof = Token(TokenType.EOF, len(source), len(source), None, self.source_map)
+        self.limits = limits
+        self.memo = memo
+        self.hash_cons = hash_cons
+        self.sinks = {phase: DiagnosticSink(limits) for phase in _DIAGNOSED_PHASES}
+        self.tokens: list[Token] = []
+        self.statements: list[Declaration] = []
+        self.span_table: SpanTable | None = None
+        self.symbols = SymbolTable()
+        self.temps = TempFactory()
+        self.tac = TACColumns()
+        self.optimized = TACColumns()
+        self.optimizer = SliceOptimizer()
+        self.asm = TARGETS[Target(target)]()
+        self.optimized_asm = TARGETS[Target(target)]()
+
+    def lex(self, bounds: tuple[int, int]) -> list[Token]:
+        start, stop = bounds
+        chunk = lex_range(self.source, start, stop, self.source_map, self.sinks[Phase.LEXER])
+        self.tokens.extend(chunk)
+        return chunk
+
+    def parse(self, chunk: list[Token], meter: BudgetMeter | None = None) -> Program:
+        program, _ = parse(
+            chunk + [self.eof], self.sinks[Phase.PARSER], hash_cons=self.hash_cons, meter=meter
+        )
+        self.statements.extend(program.statements)
+        self.span_table = program.span_table
+        return program
+
+    def analyze(self, program: Program) -> None:
+        analyze(program, self.sinks[Phase.SEMANTIC], self.symbols)
+
+    def lower(self, program: Program) -> TACProgram:
+        chunk = generate_tac(program, self.temps, self.memo)
+        self.tac.extend(chunk.columns)
+        self.tac.shared |= chunk.shared
+        return chunk
+
+    def optimize(self, chunk: TACProgram) -> TACProgram:
+        cols = chunk.columns.copy()
+        self.optimizer.run(cols)
+        self.optimized.extend(cols)
+        return TACProgram(shared=chunk.shared, columns=cols)
+
+    def reported(self) -> int:
+        return sum(
+            sum(d.count for d in sink.diagnostics) + sum(sink.suppressed.values())
+            for sink in self.sinks.values()
+        )
+
+    def result(
+        self,
+        recorder: MetricsRecorder,
+        memo_before: MemoStats | None,
+        stopped: Diagnostic | None = None,
+    ) -> CompilationResult:
+        sink = DiagnosticSink(self.limits)
+        for phase, stage_sink in self.sinks.items():
+            sink.extend(stage_sink.diagnostics)
+            suppressed = stage_sink.suppressed.get(phase)
+            if suppressed:
+                sink.suppressed[phase] = sink.suppressed.get(phase, 0) + suppressed
+        diagnostics = sink.finish()
+        if stopped is not None:
+            # Outside the caps: the budget diagnostic is always reported.
+            diagnostics.append(stopped)
+
+        tokens = self.tokens + [self.eof]
+        program = Program(statements=self.statements, span_table=self.span_table)
+        tac = TACProgram(shared=self.tac.shared, columns=self.tac)
+        assembly = self.asm.program()
+        optimized_tac = OptimizationResult(
+            TACProgram(shared=self.tac.shared, columns=self.optimized),
+            self.optimizer.explanations(),
+        )
+        optimized_assembly = self.optimized_asm.program()
+        record_counters(
+            recorder,
+            tokens=tokens,
+            program=program,
+            tac=tac,
+            assembly=assembly,
+            optimized_tac=optimized_tac,
+            optimized_assembly=optimized_assembly,
+            diagnostics=diagnostics,
+        )
+        if self.memo is not None:
+            record_memo(recorder, memo_before, self.memo.stats())
+
+        return CompilationResult(
+            tokens=tokens,
+            ast=program,
+            semantic=SemanticResult(self.symbols, sink.finish(Phase.SEMANTIC)),
+            tac=tac,
+            assembly=assembly,
+            optimized_tac=optimized_tac,
+            optimized_assembly=optimized_assembly,
+            diagnostics=diagnostics,
+            metrics=recorder.finish(),
+            stopped=stopped,
+        )
+
+
+def compile_many_threaded(
+    sources: Iterable[str | bytes | mmap], *, workers: int | None = None, **options: Any
+) -> list[CompilationResult]:
+    # Phase state (ParserState, SymbolTable, TempFactory, allocators, sinks) is
+    # created per call, so compilations share nothing but a `memo` passed in, which
+    # locks. Its hit counters in each result's metrics then include other threads'.
+    # cProfile and tracemalloc are process-wide, hence no `profile`.
+    if options.get("profile"):
+        raise ValueError("profile is not supported for threaded compilation")
+    with ThreadPoolExecutor(workers) as pool:
+        return list(pool.map(partial(compile_source, **options), sources))
+
+
+def compile_many(
+    sources: Iterable[str | bytes], *, workers: int | None = None, **options: Any
+) -> list[CompilationResult]:
+    # Process pool: sources and results are pickled, so inputs must be str or
+    # bytes and a memo cannot be shared.
+    if options.get("memo") is not None:
+        raise ValueError("memo cannot be shared across processes")
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(partial(compile_source, **options), sources))
+
+
+def _byte_length(source: str | bytes | mmap) -> int:
+    # Text is measured as its UTF-8 encoding, so a byte budget applies the same
+    # limit to --stdin input as to the mapped file.
+    if isinstance(source, str) and not source.isascii():
+        return len(source.encode("utf-8", "surrogateescape"))
+    return len(source)
+
+
+def _last_span(program: Program) -> Span | None:
+    return program.statements[-1].span if program.statements else None
+
+
+class _Stage(threading.Thread):
+    # Runs `work` on each item and hands the result to every outbox. After a
+    # failure the stage keeps consuming, so the stages around it never block, and
+    # `compile_pipelined` re-raises the error once all of them have finished. The
+    # outboxes are closed however the stage ends.
+    def __init__(
+        self,
+        name: str,
+        work: Callable[[Any], Any],
+        items: Iterable[Any],
+        outboxes: list[Queue],
+    ) -> None:
+        super().__init__(name=name, daemon=True)
+        self.work = work
+        self.items = items
+        self.outboxes = outboxes
+        self.seconds = 0.0
+        self.error: Exception | None = None
+
+    def run(self) -> None:
+        try:
+            for item in self.items:
+                if self.error is not None:
+                    continue
+                start = time.perf_counter()
+                try:
+                    result = self.work(item)
+                except Exception as exc:  # noqa: BLE001 - re-raised by compile_pipelined
+                    self.error = exc
+                    continue
+                finally:
+                    self.seconds += time.perf_counter() - start
+                for outbox in self.outboxes:
+                    outbox.put(result)
+        except Exception as exc:  # noqa: BLE001 - re-raised by compile_pipelined
+            self.error = exc
+        finally:
+            for outbox in self.outboxes:
+                outbox.put(_DONE)
+
+
+def _drain(queue: Queue) -> Iterator[Any]:
+    return iter(queue.get, _DONE)
+
+
+def _pieces(source: str | bytes | mmap, start: int, stop: int) -> Iterator[tuple[int, int]]:
+    # Cuts source[start:stop] about every LEX_PIECE characters, so budgets are
+    # checked while lexing a long run without ';'. The pieces lex as the whole.
+    cut = _TEXT_CUT if isinstance(source, str) else _BYTES_CUT
+    while stop - start > LEX_PIECE:
+        m = cut.search(source, start + LEX_PIECE, stop)  # type: ignore[arg-type]
+        if m is None:
+            break
+        yield start, m.end()
+        start = m.end()
+    yield start, stop
+
+
+def _slices(source: str | bytes | mmap, batch: int) -> Iterator[tuple[int, int]]:
+    # (start, stop) offsets of consecutive runs of `batch` statements.
+    semicolon = ";" if isinstance(source, str) else b";"
+    n = len(source)
+    start = 0
+    while start < n:
+        stop = start
+        for _ in range(batch):
+            idx = source.find(semicolon, stop)  # type: ignore[arg-type]
+            if idx < 0:
+                stop = n
+                break
+            stop = idx + 1
+        yield start, stop
+        start = stop
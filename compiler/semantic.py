@@ -3,7 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 
 from . import ast
-from .diagnostics import Diagnostic, Phase, Span, diag
+from .diagnostics import Diagnostic, DiagnosticSink, Phase, Span, diag
 
 
 @dataclass(frozen=True)
@@ -15,12 +15,15 @@ class Symbol:
 
 
 class SymbolTable:
-    def __init__(self) -> None:
+    # A table with a parent extends it without copying: lookups fall through to
+    # the parent, declarations land in this table only.
+    def __init__(self, parent: SymbolTable | None = None) -> None:
         self._symbols: dict[str, Symbol] = {}
+        self.parent = parent
 
     def declare(self, symbol: Symbol) -> Diagnostic | None:
-        if symbol.name in self._symbols:
-            existing = self._symbols[symbol.name]
+        existing = self.lookup(symbol.name)
+        if existing is not None:
             return diag(
                 Phase.SEMANTIC,
                 "SEM001",
@@ -31,10 +34,37 @@ class SymbolTable:
         return None
 
     def lookup(self, name: str) -> Symbol | None:
-        return self._symbols.get(name)
+        table: SymbolTable | None = self
+        while table is not None:
+            symbol = table._symbols.get(name)
+            if symbol is not None:
+                return symbol
+            table = table.parent
+        return None
 
     def all(self) -> list[Symbol]:
-        return list(self._symbols.values())
+        return [symbol for table in self._chain() for symbol in table._symbols.values()]
+
+    def squash(self) -> SymbolTable:
+        # One table with the symbols of this table and its ancestors, except the
+        # outermost, which it keeps as its parent without copying it.
+        chain = self._chain()
+        if len(chain) <= 2:
+            return self
+        squashed = SymbolTable(chain[0])
+        for table in chain[1:]:
+            squashed._symbols.update(table._symbols)
+        return squashed
+
+    def _chain(self) -> list[SymbolTable]:
+        # This table and its ancestors, outermost first.
+        chain: list[SymbolTable] = []
+        table: SymbolTable | None = self
+        while table is not None:
+            chain.append(table)
+            table = table.parent
+        chain.reverse()
+        return chain
 
 
 @dataclass(frozen=True)
@@ -43,33 +73,55 @@ class SemanticResult:
     diagnostics: list[Diagnostic]
 
 
-def analyze(program: ast.Program) -> SemanticResult:
-    diagnostics: list[Diagnostic] = []
-    table = SymbolTable()
+def analyze(
+    program: ast.Program,
+    sink: DiagnosticSink | None = None,
+    table: SymbolTable | None = None,
+) -> SemanticResult:
+    sink = sink or DiagnosticSink()
+    table = table if table is not None else SymbolTable()
+    occurrences = _Occurrences(program.span_table) if program.span_table else None
 
     for decl in program.statements:
         symbol = Symbol(name=decl.assignment.target.name, type_name=decl.type_name, span=decl.span)
         dup = table.declare(symbol)
         if dup:
-            diagnostics.append(dup)
-        diagnostics.extend(_check_expr(decl.assignment.value, table))
+            sink.report(dup)
+        sink.extend(_check_expr(decl.assignment.value, table, occurrences))
+
+    return SemanticResult(symbols=table, diagnostics=sink.finish(Phase.SEMANTIC))
+
+
+class _Occurrences:
+    # Hash-consed identifiers are shared between occurrences; the walk below visits
+    # them in source order, so the n-th visit of a node takes its n-th span.
+    def __init__(self, spans: ast.SpanTable) -> None:
+        self._spans = spans
+        self._seen: dict[int, int] = {}
 
-    return SemanticResult(symbols=table, diagnostics=diagnostics)
+    def next(self, node: ast.Expr) -> Span | None:
+        idx = self._seen.get(id(node), 0)
+        self._seen[id(node)] = idx + 1
+        spans = self._spans.spans(node)
+        return spans[idx] if idx < len(spans) else None
 
 
-def _check_expr(expr: ast.Expr, table: SymbolTable) -> list[Diagnostic]:
+def _check_expr(
+    expr: ast.Expr, table: SymbolTable, occurrences: _Occurrences | None = None
+) -> list[Diagnostic]:
     diagnostics: list[Diagnostic] = []
     if isinstance(expr, ast.Identifier):
+        span = occurrences.next(expr) if occurrences is not None else expr.span
         if table.lookup(expr.name) is None:
             diagnostics.append(
                 diag(
                     Phase.SEMANTIC,
                     "SEM002",
                     f"Use of undeclared identifier '{expr.name}'",
-                    expr.span,
+                    span,
                 )
             )
     elif isinstance(expr, ast.BinaryExpr):
-        diagnostics.extend(_check_expr(expr.left, table))
-        diagnostics.extend(_check_expr(expr.right, table))
+        diagnostics.extend(_check_expr(expr.left, table, occurrences))
+        diagnostics.extend(_check_expr(expr.right, table, occurrences))
     return diagnostics
@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+import json
+from array import array
+from collections.abc import Mapping, MutableMapping
+from copy import copy
+from dataclasses import dataclass
+from mmap import mmap
+from typing import Any
+
+from .ast import TypeName
+from .codegen import LOAD, STORE, AssemblyProgram, RegisterAllocator
+from .codegen import generate as generate_asm
+from .diagnostics import Diagnostic, DiagnosticSink, Phase, SourceMap, Span
+from .lexer import lex
+from .parser import parse
+from .semantic import Symbol, SymbolTable, analyze
+from .tac import TACInstr, TACProgram, TempFactory
+from .tac import generate as generate_tac
+
+SNAPSHOT_VERSION = 1
+# Resumes layer their state over the snapshot they start from; past this many
+# layers the layers above the root state are merged into one, so lookups stay
+# bounded. The root state is never copied.
+LAYER_LIMIT = 8
+
+
+class Layer(MutableMapping):
+    # A mapping over a read-only base mapping. Writes and deletions stay in the
+    # layer, so resuming from a snapshot neither copies nor mutates the snapshot's
+    # state; values are copied the first time they are fetched for update
+    # (setdefault). Iteration and len() see the base entries the layer keeps.
+    def __init__(self, base: Mapping) -> None:
+        self.base = base
+        self.local: dict = {}
+        self.deleted: set = set()
+
+    def __getitem__(self, key):
+        local = self.local
+        if key in local:
+            return local[key]
+        if key in self.deleted:
+            raise KeyError(key)
+        return self.base[key]
+
+    def __contains__(self, key) -> bool:
+        if key in self.local:
+            return True
+        return key not in self.deleted and key in self.base
+
+    def __setitem__(self, key, value) -> None:
+        self.deleted.discard(key)
+        self.local[key] = value
+
+    def __delitem__(self, key) -> None:
+        if key not in self:
+            raise KeyError(key)
+        self.local.pop(key, None)
+        self.deleted.add(key)
+
+    def __iter__(self):
+        local, deleted = self.local, self.deleted
+        yield from local
+        for key in self.base:
+            if key not in local and key not in deleted:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def get(self, key, default=None):
+        local = self.local
+        if key in local:
+            return local[key]
+        if key in self.deleted:
+            return default
+        return self.base.get(key, default)
+
+    def setdefault(self, key, default=None):
+        local = self.local
+        if key in local:
+            return local[key]
+        if key not in self.deleted and key in self.base:
+            default = copy(self.base[key])
+        self[key] = default
+        return default
+
+    def squash(self) -> Layer:
+        # One layer with the writes and deletions of this layer and the layers
+        # under it, over the same root mapping.
+        chain = [self]
+        base = self.base
+        while isinstance(base, Layer):
+            chain.append(base)
+            base = base.base
+        squashed = Layer(base)
+        local, deleted = squashed.local, squashed.deleted
+        for layer in reversed(chain):
+            for key in layer.deleted:
+                local.pop(key, None)
+            deleted.update(layer.deleted)
+            deleted.difference_update(layer.local)
+            local.update(layer.local)
+        return squashed
+
+
+@dataclass
+class Snapshot:
+    # Compiler state after a prefix of the program. A resumed snapshot holds only
+    # its own segment of TAC/assembly and layers its state over `parent`; `layers`
+    # counts the state layers below its own.
+    symbols: SymbolTable
+    temps: int
+    registers: int
+    regmap: Mapping[str, int]
+    holders: Mapping[int, list[str]]
+    tac: list[TACInstr]
+    assembly: AssemblyProgram
+    diagnostics: list[Diagnostic]
+    parent: Snapshot | None = None
+    layers: int = 0
+
+    def segments(self) -> list[Snapshot]:
+        chain: list[Snapshot] = []
+        node: Snapshot | None = self
+        while node is not None:
+            chain.append(node)
+            node = node.parent
+        chain.reverse()
+        return chain
+
+    def compact(self) -> Snapshot:
+        if self.parent is None:
+            return self
+        segments = self.segments()
+        symbols = SymbolTable()
+        for symbol in self.symbols.all():
+            symbols.declare(symbol)
+        return Snapshot(
+            symbols=symbols,
+            temps=self.temps,
+            registers=self.registers,
+            regmap=dict(self.regmap),
+            holders={reg: list(names) for reg, names in self.holders.items()},
+            tac=[instr for segment in segments for instr in segment.tac],
+            assembly=_concat([segment.assembly for segment in segments], self.registers),
+            diagnostics=[d for segment in segments for d in segment.diagnostics],
+        )
+
+    def to_dict(self) -> dict:
+        flat = self.compact()
+        asm = flat.assembly
+        return {
+            "version": SNAPSHOT_VERSION,
+            "symbols": [
+                [s.name, s.type_name.value, _position(s.span), s.scope] for s in flat.symbols.all()
+            ],
+            "temps": flat.temps,
+            "registers": flat.registers,
+            "regmap": dict(flat.regmap),
+            "holders": [[reg, names] for reg, names in flat.holders.items()],
+            "tac": [[i.op, i.arg1, i.arg2, i.result] for i in flat.tac],
+            "assembly": {
+                "ops": list(asm.ops),
+                "a": asm.a,
+                "b": asm.b,
+                "names": asm.names,
+            },
+            "diagnostics": [
+                [d.phase.value, d.code, d.message, _position(d.span), _position(d.end), d.count]
+                for d in flat.diagnostics
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Snapshot:
+        if data.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {data.get('version')}")
+        positions = [s[2] for s in data["symbols"]]
+        positions += [p for d in data["diagnostics"] for p in (d[3], d[4])]
+        span = _span_factory(positions)
+
+        symbols = SymbolTable()
+        for name, type_name, position, scope in data["symbols"]:
+            symbols.declare(Symbol(name, TypeName(type_name), span(position), scope))
+        asm = data["assembly"]
+        return cls(
+            symbols=symbols,
+            temps=data["temps"],
+            registers=data["registers"],
+            regmap=dict(data["regmap"]),
+            holders={reg: names for reg, names in data["holders"]},
+            tac=[TACInstr(*instr) for instr in data["tac"]],
+            assembly=AssemblyProgram(
+                array("B", asm["ops"]), asm["a"], asm["b"], asm["names"], data["registers"]
+            ),
+            diagnostics=[
+                Diagnostic(Phase(phase), code, message, span(start), span(end), count)
+                for phase, code, message, start, end, count in data["diagnostics"]
+            ],
+        )
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(self.to_dict(), handle)
+
+    @classmethod
+    def load(cls, path: str) -> Snapshot:
+        with open(path, "r", encoding="utf-8") as handle:
+            return cls.from_dict(json.load(handle))
+
+
+@dataclass(frozen=True)
+class SnippetResult:
+    tac: TACProgram
+    assembly: AssemblyProgram
+    diagnostics: list[Diagnostic]
+    snapshot: Snapshot
+
+
+def take_snapshot(source: str | bytes | mmap, *, hash_cons: bool = False) -> Snapshot:
+    return _compile(source, None, hash_cons).snapshot
+
+
+def resume(
+    snapshot: Snapshot, source: str | bytes | mmap, *, hash_cons: bool = False
+) -> SnippetResult:
+    # Only the snippet is lexed, parsed and lowered; the base state is read through
+    # at most LAYER_LIMIT layers, so the cost does not grow with the chain.
+    return _compile(source, snapshot, hash_cons)
+
+
+def _compile(source: str | bytes | mmap, base: Snapshot | None, hash_cons: bool) -> SnippetResult:
+    sink = DiagnosticSink()
+    tokens, _ = lex(source, sink)
+    program, _ = parse(tokens, sink, hash_cons=hash_cons)
+    if base is None:
+        symbols, layers = SymbolTable(), 0
+        allocator = RegisterAllocator()
+    elif base.layers < LAYER_LIMIT:
+        symbols, layers = SymbolTable(base.symbols), base.layers + 1
+        allocator = RegisterAllocator(base.registers, Layer(base.regmap), Layer(base.holders))
+    else:
+        symbols, layers = SymbolTable(base.symbols.squash()), 2
+        allocator = RegisterAllocator(
+            base.registers, Layer(_squash(base.regmap)), Layer(_squash(base.holders))
+        )
+    analyze(program, sink, symbols)
+
+    temps = TempFactory(base.temps if base is not None else 0)
+    tac = generate_tac(program, temps)
+    assembly = generate_asm(tac, allocator)
+    regmap, holders = allocator.bindings()
+
+    diagnostics = sink.finish()
+    snapshot = Snapshot(
+        symbols=symbols,
+        temps=temps.count,
+        registers=allocator.register_count(),
+        regmap=regmap,
+        holders=holders,
+        tac=tac.instructions,
+        assembly=assembly,
+        diagnostics=diagnostics,
+        parent=base,
+        layers=layers,
+    )
+    return SnippetResult(tac=tac, assembly=assembly, diagnostics=diagnostics, snapshot=snapshot)
+
+
+def _squash(state: Mapping) -> Mapping:
+    return state.squash() if isinstance(state, Layer) else state
+
+
+def _concat(programs: list[AssemblyProgram], registers: int) -> AssemblyProgram:
+    # Segments have their own name tables; memory operands are renumbered into one.
+    ops = array("B")
+    a: list[int] = []
+    b: list[int] = []
+    names: list[str] = []
+    name_ids: dict[str, int] = {}
+    for program in programs:
+        remap = []
+        for name in program.names:
+            if name not in name_ids:
+                name_ids[name] = len(names)
+                names.append(name)
+            remap.append(name_ids[name])
+        for op, x, y in program:
+            ops.append(op)
+            a.append(remap[x] if op == STORE else x)
+            b.append(remap[y] if op == LOAD else y)
+    return AssemblyProgram(ops, a, b, names, registers)
+
+
+def _position(span: Span | None) -> list[int] | None:
+    return [span.line, span.col] if span is not None else None
+
+
+def _span_factory(positions: list[Any]):
+    # Restored spans come from several sources; one synthetic map lays the lines
+    # out on a fixed stride so each (line, col) maps to a unique offset.
+    present = [p for p in positions if p is not None]
+    stride = max((col for _, col in present), default=0) + 1
+    lines = max((line for line, _ in present), default=1)
+    source_map = SourceMap.from_line_starts([k * stride for k in range(lines)])
+
+    def span(position: list[int] | None) -> Span | None:
+        if position is None:
+            return None
+        line, col = position
+        return Span((line - 1) * stride + col - 1, source_map)
+
+    return span
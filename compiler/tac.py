@@ -1,9 +1,34 @@
 from __future__ import annotations
 
+from array import array
+from collections.abc import Iterator
 from dataclasses import dataclass
+from itertools import compress
+from typing import TYPE_CHECKING
 
 from . import ast
 
+if TYPE_CHECKING:
+    from .memo import ShapeCache
+
+OP_ASSIGN = 0
+OP_ADD = 1
+OP_MUL = 2
+OP_NOP = 3
+
+OPCODES = {"ASSIGN": OP_ASSIGN, "+": OP_ADD, "*": OP_MUL}
+OP_NAMES = ["ASSIGN", "+", "*"]
+
+# Operand tags, stored in the low two bits of an encoded operand.
+NONE = 0
+TEMP = 1
+VAR = 2
+CONST = 3
+
+# Where temps share a table with variables (register bindings, memory cells of
+# spilled temps), they are keyed with a prefix no identifier can start with.
+TEMP_KEY_PREFIX = "%"
+
 
 @dataclass(frozen=True)
 class TACInstr:
@@ -13,41 +38,337 @@ class TACInstr:
     result: str
 
 
-@dataclass(frozen=True)
 class TACProgram:
-    instructions: list[TACInstr]
+    # Holds the instruction list, its columnar form or both; a missing form is
+    # derived from the other on first use. Passes over large programs work on
+    # `columns` and never need the per-instruction objects.
+    def __init__(
+        self,
+        instructions: list[TACInstr] | None = None,
+        shared: frozenset[str] = frozenset(),
+        *,
+        columns: TACColumns | None = None,
+    ) -> None:
+        if instructions is None and columns is None:
+            instructions = []
+        self._instructions = instructions
+        self._columns = columns
+        # Temps read more than once (common subexpressions of a hash-consed AST).
+        self.shared = shared
+
+    @property
+    def instructions(self) -> list[TACInstr]:
+        if self._instructions is None:
+            self._instructions = self._columns.decode_all()  # type: ignore[union-attr]
+        return self._instructions
+
+    @property
+    def columns(self) -> TACColumns:
+        if self._columns is None:
+            self._columns = TACColumns.from_instructions(self.instructions, self.shared)
+        return self._columns
+
+    def __len__(self) -> int:
+        if self._instructions is None:
+            return len(self._columns)  # type: ignore[arg-type]
+        return len(self._instructions)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TACProgram):
+            return NotImplemented
+        return self.instructions == other.instructions and self.shared == other.shared
+
+    def __repr__(self) -> str:
+        return f"TACProgram(instructions={self.instructions!r}, shared={self.shared!r})"
+
+    @property
+    def temps(self) -> frozenset[str]:
+        return self.columns.temp_names()
+
+
+class TACColumns:
+    # Columnar TAC: integer opcodes and tagged operands in parallel arrays. An
+    # operand is `index << 2 | tag`; the index points into `names` for temps and
+    # variables and into `consts` for constants. Passes rewrite rows in place and
+    # mark deleted rows OP_NOP until `compact`. A name is a temp because TAC
+    # generation made it one, not because of its spelling: a declared `t5` is a
+    # variable, and lives in its own entry even if a temp `t5` exists too.
+    def __init__(self, shared: frozenset[str] = frozenset()) -> None:
+        self.ops = array("B")
+        self.arg1 = array("q")
+        self.arg2 = array("q")
+        self.result = array("q")
+        self.names: list[str] = []
+        self.consts: list[int] = []
+        self.shared = shared
+        self._name_ids: dict[str, int] = {}
+        self._temp_ids: dict[str, int] = {}
+        self._const_ids: dict[int, int] = {}
+
+    @classmethod
+    def from_instructions(
+        cls,
+        instructions: list[TACInstr],
+        shared: frozenset[str] = frozenset(),
+        temps: frozenset[str] | None = None,
+    ) -> TACColumns:
+        # Instruction lists do not record which names are temps; without `temps`
+        # they are recognized by spelling.
+        cols = cls(shared)
+        ops, arg1, arg2, result = cols.ops, cols.arg1, cols.arg2, cols.result
+        is_temp_name = is_temp if temps is None else temps.__contains__
+
+        def name(value: str) -> int:
+            return cols.temp(value) if is_temp_name(value) else cols.name(value)
+
+        def operand(value: str | int | None) -> int:
+            if value is None:
+                return NONE
+            if isinstance(value, int):
+                return cols.const(value)
+            return name(value)
+
+        for instr in instructions:
+            opcode = OPCODES.get(instr.op)
+            if opcode is None:
+                raise ValueError(f"Unsupported TAC op: {instr.op}")
+            ops.append(opcode)
+            arg1.append(operand(instr.arg1))
+            arg2.append(operand(instr.arg2))
+            result.append(name(instr.result))
+        return cols
+
+    def decode_all(self, names: list[str] | None = None) -> list[TACInstr]:
+        # `names` replaces the name table, e.g. with `keys()`.
+        names = self.names if names is None else names
+        consts = self.consts
+
+        def decode(operand: int) -> str | int | None:
+            tag = operand & 3
+            if tag == CONST:
+                return consts[operand >> 2]
+            return None if tag == NONE else names[operand >> 2]
+
+        return [
+            TACInstr(OP_NAMES[op], decode(a), decode(b), names[r >> 2])
+            for op, a, b, r in self.rows()
+            if op != OP_NOP
+        ]
+
+    def copy(self) -> TACColumns:
+        cols = TACColumns(self.shared)
+        cols.ops, cols.arg1, cols.arg2, cols.result = (
+            array(col.typecode, col) for col in (self.ops, self.arg1, self.arg2, self.result)
+        )
+        cols.names, cols.consts = list(self.names), list(self.consts)
+        cols._name_ids, cols._const_ids = dict(self._name_ids), dict(self._const_ids)
+        cols._temp_ids = dict(self._temp_ids)
+        return cols
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    def rows(self) -> Iterator[tuple[int, int, int, int]]:
+        return zip(self.ops, self.arg1, self.arg2, self.result)
+
+    def name(self, name: str) -> int:
+        code = self._name_ids.get(name)
+        if code is None:
+            code = self._name_ids[name] = len(self.names) << 2 | VAR
+            self.names.append(name)
+        return code
+
+    def temp(self, name: str) -> int:
+        code = self._temp_ids.get(name)
+        if code is None:
+            code = self._temp_ids[name] = len(self.names) << 2 | TEMP
+            self.names.append(name)
+        return code
+
+    def keys(self) -> list[str]:
+        # The name table with temps spelled as temp keys, so a temp and a
+        # variable of the same name stay apart.
+        keys = list(self.names)
+        for name, code in self._temp_ids.items():
+            keys[code >> 2] = temp_key(name)
+        return keys
+
+    def temp_keys(self) -> frozenset[str]:
+        return frozenset(map(temp_key, self._temp_ids))
+
+    def temp_names(self) -> frozenset[str]:
+        # A temp spelled like a variable of the program is reported as the variable.
+        return frozenset(self._temp_ids).difference(self._name_ids)
+
+    def temps(self, first: int, count: int) -> range:
+        # Encodes `count` fresh temps t<first>.. in one step; consecutive name
+        # indices give encoded operands 4 apart.
+        start = len(self.names)
+        names = [f"t{n}" for n in range(first, first + count)]
+        self.names.extend(names)
+        codes = range(start << 2 | TEMP, (start + count) << 2 | TEMP, 4)
+        self._temp_ids.update(zip(names, codes))
+        return codes
+
+    def const(self, value: int) -> int:
+        code = self._const_ids.get(value)
+        if code is None:
+            code = self._const_ids[value] = len(self.consts) << 2 | CONST
+            self.consts.append(value)
+        return code
+
+    def decode(self, operand: int) -> str | int | None:
+        tag = operand & 3
+        if tag == CONST:
+            return self.consts[operand >> 2]
+        if tag == NONE:
+            return None
+        return self.names[operand >> 2]
+
+    def append(self, opcode: int, arg1: int, arg2: int, result: int) -> None:
+        self.ops.append(opcode)
+        self.arg1.append(arg1)
+        self.arg2.append(arg2)
+        self.result.append(result)
+
+    def extend(self, other: TACColumns) -> None:
+        # Appends the rows of `other`, re-encoding its operands against this table.
+        names = [NONE] * len(other.names)
+        for name, code in other._name_ids.items():
+            names[code >> 2] = self.name(name)
+        for name, code in other._temp_ids.items():
+            names[code >> 2] = self.temp(name)
+        consts = [self.const(value) for value in other.consts]
+
+        def encode(operand: int) -> int:
+            tag = operand & 3
+            if tag == NONE:
+                return operand
+            return consts[operand >> 2] if tag == CONST else names[operand >> 2]
+
+        self.ops.extend(other.ops)
+        self.arg1.extend(map(encode, other.arg1))
+        self.arg2.extend(map(encode, other.arg2))
+        self.result.extend(map(encode, other.result))
+
+    def compact(self) -> None:
+        keep = [op != OP_NOP for op in self.ops]
+        self.ops = array("B", compress(self.ops, keep))
+        self.arg1 = array("q", compress(self.arg1, keep))
+        self.arg2 = array("q", compress(self.arg2, keep))
+        self.result = array("q", compress(self.result, keep))
 
 
 class TempFactory:
-    def __init__(self) -> None:
-        self._count = 0
+    def __init__(self, count: int = 0) -> None:
+        self._count = count
+
+    @property
+    def count(self) -> int:
+        return self._count
 
     def next(self) -> str:
         self._count += 1
         return f"t{self._count}"
 
+    def reserve(self, count: int) -> int:
+        # Claims the next `count` temp numbers and returns the first.
+        first = self._count + 1
+        self._count += count
+        return first
+
+
+def temp_key(name: str) -> str:
+    return TEMP_KEY_PREFIX + name
+
+
+def is_temp(name: str) -> bool:
+    return name[:1] == "t" and name[1:].isdigit()
+
+
+class _SubtreeCache:
+    # Temps of already-emitted canonical subtrees. An entry lives until one of the
+    # variables it reads is assigned again, i.e. for the live range of its inputs.
+    def __init__(self) -> None:
+        self.values: dict[int, str] = {}
+        self.shared: set[str] = set()
+        self._reads: dict[int, frozenset[str]] = {}
+        self._readers: dict[str, list[int]] = {}
+
+    def reads(self, expr: ast.Expr) -> frozenset[str]:
+        key = id(expr)
+        names = self._reads.get(key)
+        if names is None:
+            if isinstance(expr, ast.Identifier):
+                names = frozenset((expr.name,))
+            elif isinstance(expr, ast.BinaryExpr):
+                names = self.reads(expr.left) | self.reads(expr.right)
+            else:
+                names = frozenset()
+            self._reads[key] = names
+        return names
+
+    def add(self, expr: ast.Expr, temp: str) -> None:
+        key = id(expr)
+        self.values[key] = temp
+        for name in self.reads(expr):
+            self._readers.setdefault(name, []).append(key)
+
+    def kill(self, name: str) -> None:
+        for key in self._readers.pop(name, ()):
+            self.values.pop(key, None)
+
 
-def generate(program: ast.Program) -> TACProgram:
-    instructions: list[TACInstr] = []
-    temps = TempFactory()
+def generate(
+    program: ast.Program, temps: TempFactory | None = None, memo: ShapeCache | None = None
+) -> TACProgram:
+    # Emits straight into columns; TACInstr objects are only built if a caller
+    # reads `instructions`.
+    cols = TACColumns()
+    temps = temps or TempFactory()
+    # Only a hash-consed AST shares nodes, so only then can a subtree be reused.
+    cache = _SubtreeCache() if program.span_table is not None else None
+    # Shape templates are per statement; subtree reuse spans statements, so the
+    # two are exclusive.
+    if cache is not None:
+        memo = None
 
     for decl in program.statements:
-        value = _emit_expr(decl.assignment.value, instructions, temps)
-        instructions.append(TACInstr("ASSIGN", value, None, decl.assignment.target.name))
+        target = decl.assignment.target.name
+        if memo is not None:
+            memo.lower(decl.assignment.value, target, cols, temps)
+            continue
+        value = _emit_expr(decl.assignment.value, cols, temps, cache)
+        cols.append(OP_ASSIGN, value, NONE, cols.name(target))
+        if cache is not None:
+            cache.kill(target)
 
-    return TACProgram(instructions=instructions)
+    cols.shared = frozenset(cache.shared) if cache is not None else frozenset()
+    return TACProgram(shared=cols.shared, columns=cols)
 
 
-def _emit_expr(expr: ast.Expr, instructions: list[TACInstr], temps: TempFactory) -> str | int:
+def _emit_expr(
+    expr: ast.Expr,
+    cols: TACColumns,
+    temps: TempFactory,
+    cache: _SubtreeCache | None = None,
+) -> int:
     if isinstance(expr, ast.Literal):
-        return expr.value
+        return cols.const(expr.value)
     if isinstance(expr, ast.Identifier):
-        return expr.name
+        return cols.name(expr.name)
     if isinstance(expr, ast.BinaryExpr):
-        left = _emit_expr(expr.left, instructions, temps)
-        right = _emit_expr(expr.right, instructions, temps)
+        if cache is not None:
+            temp = cache.values.get(id(expr))
+            if temp is not None:
+                cache.shared.add(temp)
+                return cols.temp(temp)
+        left = _emit_expr(expr.left, cols, temps, cache)
+        right = _emit_expr(expr.right, cols, temps, cache)
         temp = temps.next()
-        op = expr.op.value
-        instructions.append(TACInstr(op, left, right, temp))
-        return temp
+        result = cols.temp(temp)
+        cols.append(OPCODES[expr.op.value], left, right, result)
+        if cache is not None:
+            cache.add(expr, temp)
+        return result
     raise TypeError(f"Unsupported expr type: {type(expr)}")
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+from . import ast
+
+ELISION = "..."
+
+
+@dataclass(frozen=True)
+class RenderOptions:
+    max_depth: int | None = None
+    max_nodes: int | None = None
+    dedup: bool = False
+    subgraphs: bool = False
+
+
+@dataclass
+class AstGraph:
+    labels: list[str] = field(default_factory=list)
+    children: list[list[int]] = field(default_factory=list)
+    roots: list[int] = field(default_factory=list)
+    groups: list[tuple[str, list[int]]] = field(default_factory=list)
+    elided: int = 0
+
+
+class _GraphBuilder:
+    def __init__(self, options: RenderOptions) -> None:
+        self.options = options
+        self.graph = AstGraph()
+        self._interned: dict[tuple[str, tuple[int, ...]], int] = {}
+        self._group: list[int] | None = None
+        self._count = 0
+        self._reserved = 0
+
+    def full(self) -> bool:
+        limit = self.options.max_nodes
+        return limit is not None and self._count >= limit
+
+    def node(self, label: str, children: list[int] | None = None) -> int:
+        children = children or []
+        if self.options.dedup:
+            key = (label, tuple(children))
+            existing = self._interned.get(key)
+            if existing is not None:
+                return existing
+        nid = len(self.graph.labels)
+        self.graph.labels.append(label)
+        self.graph.children.append(children)
+        self._count += 1
+        if self._group is not None:
+            self._group.append(nid)
+        if self.options.dedup:
+            self._interned[(label, tuple(children))] = nid
+        return nid
+
+    def elision(self, label: str = ELISION) -> int:
+        nid = len(self.graph.labels)
+        self.graph.labels.append(label)
+        self.graph.children.append([])
+        self.graph.elided += 1
+        self._count += 1
+        if self._group is not None:
+            self._group.append(nid)
+        return nid
+
+    def expr(self, expr: ast.Expr, depth: int) -> int:
+        # Walked with an explicit stack. Every pending expression holds a reserved
+        # node slot; a binary expression is expanded only if its two children fit
+        # in the budget too, otherwise its whole subtree becomes one elision.
+        if self.full():
+            return self.elision()
+        limit = self.options.max_nodes
+        results: list[int] = []
+        stack: list[tuple[ast.Expr, int, bool]] = [(expr, depth, False)]
+        self._reserved = 1
+        while stack:
+            current, level, expanded = stack.pop()
+            self._reserved -= 1
+            if isinstance(current, ast.BinaryExpr) and expanded:
+                right = results.pop()
+                left = results.pop()
+                results.append(self.node(f"Expr({current.op.value})", [left, right]))
+            elif self._too_deep(level):
+                results.append(self.elision())
+            elif isinstance(current, ast.Identifier):
+                results.append(self.node(f"Identifier: {current.name}"))
+            elif isinstance(current, ast.Literal):
+                results.append(self.node(f"Literal: {current.value}"))
+            elif isinstance(current, ast.BinaryExpr):
+                if limit is not None and self._count + self._reserved + 3 > limit:
+                    results.append(self.elision())
+                    continue
+                self._reserved += 3
+                stack.append((current, level, True))
+                stack.append((current.right, level + 1, False))
+                stack.append((current.left, level + 1, False))
+            else:
+                raise TypeError(f"Unknown expr {type(current)}")
+        return results[0]
+
+    def declaration(self, decl: ast.Declaration, depth: int) -> list[int]:
+        type_node = self.node(f"Type: {decl.type_name.value}")
+        if self._too_deep(depth + 1):
+            return [type_node, self.node("Assign", [self.elision()])]
+        target = self.node(f"Identifier: {decl.assignment.target.name}")
+        value = self.expr(decl.assignment.value, depth + 1)
+        return [type_node, self.node("Assign", [target, value])]
+
+    def _too_deep(self, depth: int) -> bool:
+        limit = self.options.max_depth
+        return limit is not None and depth > limit
+
+    def build(self, program: ast.Program) -> AstGraph:
+        statements = program.statements
+        if self.options.subgraphs:
+            for idx, decl in enumerate(statements):
+                if self.full():
+                    self.graph.roots.append(self._elide_rest(len(statements) - idx))
+                    break
+                self._group = []
+                self.graph.groups.append((_statement_title(decl), self._group))
+                if self._too_deep(1):
+                    members = [self.elision()]
+                else:
+                    members = self.declaration(decl, 1)
+                self.graph.roots.append(self.node("Declaration", members))
+                self._group = None
+            return self.graph
+
+        children: list[int] = []
+        if statements and self._too_deep(1):
+            children.append(self._elide_rest(len(statements)))
+        else:
+            for idx, decl in enumerate(statements):
+                if self.full():
+                    children.append(self._elide_rest(len(statements) - idx))
+                    break
+                children.extend(self.declaration(decl, 1))
+        self.graph.roots.append(self.node("Declaration", children))
+        return self.graph
+
+    def _elide_rest(self, remaining: int) -> int:
+        return self.elision(f"{ELISION} {remaining} declaraciones omitidas")
+
+
+def _statement_title(decl: ast.Declaration) -> str:
+    return f"{decl.type_name.value} {decl.assignment.target.name}"
+
+
+def build_graph(program: ast.Program, options: RenderOptions | None = None) -> AstGraph:
+    return _GraphBuilder(options or RenderOptions()).build(program)
+
+
+def to_mermaid(graph: AstGraph) -> str:
+    lines = ["```mermaid", "graph TD"]
+    grouped: set[int] = set()
+    for idx, (title, members) in enumerate(graph.groups, start=1):
+        lines.append(f'  subgraph S{idx} ["{_escape(title)}"]')
+        lines.extend(f'    N{nid}["{_escape(graph.labels[nid])}"]' for nid in members)
+        lines.append("  end")
+        grouped.update(members)
+    for nid, label in enumerate(graph.labels):
+        if nid not in grouped:
+            lines.append(f'  N{nid}["{_escape(label)}"]')
+    for nid, children in enumerate(graph.children):
+        lines.extend(f"  N{nid} --> N{child}" for child in children)
+    lines.append("```")
+    return "\n".join(lines)
+
+
+def to_dot(graph: AstGraph) -> str:
+    lines = ["digraph AST {", "  node [shape=box];"]
+    for idx, (title, members) in enumerate(graph.groups, start=1):
+        lines.append(f"  subgraph cluster_{idx} {{")
+        lines.append(f'    label="{_escape_dot(title)}";')
+        lines.extend(f"    N{nid};" for nid in members)
+        lines.append("  }")
+    for nid, label in enumerate(graph.labels):
+        lines.append(f'  N{nid} [label="{_escape_dot(label)}"];')
+    for nid, children in enumerate(graph.children):
+        lines.extend(f"  N{nid} -> N{child};" for child in children)
+    lines.append("}")
+    return "\n".join(lines)
+
+
+def to_text(graph: AstGraph, indent: str = "  ") -> str:
+    parents = [0] * len(graph.labels)
+    for children in graph.children:
+        for child in children:
+            parents[child] += 1
+
+    lines: list[str] = []
+    printed: set[int] = set()
+    stack = [(root, 0) for root in reversed(graph.roots)]
+    while stack:
+        nid, depth = stack.pop()
+        label = graph.labels[nid]
+        if nid in printed:
+            lines.append(f"{indent * depth}{label} -> #{nid}")
+            continue
+        printed.add(nid)
+        suffix = f" #{nid}" if parents[nid] > 1 else ""
+        lines.append(f"{indent * depth}{label}{suffix}")
+        stack.extend((child, depth + 1) for child in reversed(graph.children[nid]))
+    return "\n".join(lines)
+
+
+RENDERERS = {"mermaid": to_mermaid, "dot": to_dot, "text": to_text}
+
+
+def render(program: ast.Program, fmt: str = "mermaid", options: RenderOptions | None = None) -> str:
+    if fmt not in RENDERERS:
+        raise ValueError(f"Unsupported AST format: {fmt}")
+    return RENDERERS[fmt](build_graph(program, options))
+
+
+def _escape(label: str) -> str:
+    return label.replace('"', "#quot;")
+
+
+def _escape_dot(label: str) -> str:
+    return label.replace("\\", "\\\\").replace('"', '\\"')
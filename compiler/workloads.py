@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+
+SHARED_NAMES = ("initial", "velocity", "rate", "offset")
+
+
+def declarations(n: int) -> str:
+    lines = ["int v0 = 0;"]
+    lines.extend(f"int v{i} = v{i - 1} + {i};" for i in range(1, n))
+    return "\n".join(lines)
+
+
+def deep_nesting(n: int, depth: int = 24) -> str:
+    lines = []
+    for i in range(n):
+        expr = "1"
+        for level in range(depth):
+            op = "+" if level % 2 else "*"
+            expr = f"({expr} {op} {level + 2})"
+        lines.append(f"int d{i} = {expr};")
+    return "\n".join(lines)
+
+
+def wide_chains(n: int, width: int = 32) -> str:
+    lines = []
+    for i in range(n):
+        terms = [f"{j + 1} * {j + 2}" if j % 2 else str(j + 1) for j in range(width)]
+        lines.append(f"int w{i} = {' + '.join(terms)};")
+    return "\n".join(lines)
+
+
+def identifier_reuse(n: int) -> str:
+    a, b, c, d = SHARED_NAMES
+    lines = [f"int {name} = {idx + 1};" for idx, name in enumerate(SHARED_NAMES)]
+    lines.extend(f"int r{i} = {a} + {b} * {c} + {d} * {a} + {b};" for i in range(n))
+    return "\n".join(lines)
+
+
+def error_dense(n: int) -> str:
+    broken = [
+        "int = 3;",
+        "int e{i} 4;",
+        "int e{i} = $ + 1;",
+        "e{i} = 5;",
+        "int e{i} = (1 + ;",
+        "int e{i} = missing{i} * 2;",
+        "int e{i} = 7 @@ 8;",
+        "int e{i} = 1",
+    ]
+    return "\n".join(broken[i % len(broken)].format(i=i) for i in range(n))
+
+
+WORKLOADS: dict[str, Callable[[int], str]] = {
+    "declarations": declarations,
+    "deep_nesting": deep_nesting,
+    "wide_chains": wide_chains,
+    "identifier_reuse": identifier_reuse,
+    "error_dense": error_dense,
+}
+
+
+def generate(name: str, n: int) -> str:
+    if name not in WORKLOADS:
+        raise ValueError(f"Unknown workload: {name}")
+    return WORKLOADS[name](n)
@@ -1,3 +1,5 @@
+import os
+
 import nox
 
 
@@ -11,5 +13,16 @@ def lint(session: nox.Session) -> None:
 
 @nox.session
 def test(session: nox.Session) -> None:
-    session.install("pytest", "pytest-cov")
+    session.install("pytest", "pytest-cov", "numpy")
     session.run("pytest")
+
+
+@nox.session
+def bench(session: nox.Session) -> None:
+    session.install("-e", ".")
+    baseline = ".benchmarks/baseline.json"
+    if not os.path.exists(baseline):
+        os.makedirs(os.path.dirname(baseline), exist_ok=True)
+        session.run("python", "-m", "compiler.bench", "--save", baseline, *session.posargs)
+        return
+    session.run("python", "-m", "compiler.bench", "--compare", baseline, *session.posargs)
@@ -0,0 +1,23 @@
+from compiler.bench import compare, measure_concurrency, run_workload, to_baseline
+
+
+def test_compare_flags_phase_regressions():
+    result = run_workload("declarations", 50, repeat=1)
+    baseline = to_baseline([result])
+    assert compare([result], baseline) == []
+
+    slower = run_workload("declarations", 50, repeat=1)
+    slower.phases["lexer"] = baseline["results"][result.key()]["phases"]["lexer"] + 1.0
+    regressions = compare([slower], baseline, threshold=0.25)
+    assert len(regressions) == 1 and "lexer" in regressions[0]
+
+
+def test_measure_concurrency_covers_both_pools():
+    results = measure_concurrency("declarations", 20, count=4, workers=(1, 2))
+    assert [(r.mode, r.workers) for r in results] == [
+        ("threads", 1),
+        ("processes", 1),
+        ("threads", 2),
+        ("processes", 2),
+    ]
+    assert all(r.compiles == 4 and r.seconds > 0 for r in results)
@@ -0,0 +1,94 @@
+import sys
+
+from compiler.budget import Budget
+from compiler.cli import main
+from compiler.pipeline import compile_source
+from compiler.workloads import declarations, error_dense
+
+
+def test_budget_within_limits_matches_unbudgeted_compile():
+    for source in (declarations(600), error_dense(600)):
+        for hash_cons in (False, True):
+            expected = compile_source(source, hash_cons=hash_cons)
+            result = compile_source(
+                source, hash_cons=hash_cons, budget=Budget(max_tokens=10**6, deadline=60)
+            )
+            assert result.stopped is None
+            assert result.tac == expected.tac
+            assert result.optimized_assembly.instructions == (
+                expected.optimized_assembly.instructions
+            )
+            assert result.diagnostics == expected.diagnostics
+
+
+def test_exceeded_budget_stops_with_partial_results():
+    source = declarations(2000)
+    result = compile_source(source, budget=Budget(max_tokens=1000))
+    assert result.stopped.code == "BUD002" and result.stopped.phase == "lexer"
+    assert result.diagnostics[-1] is result.stopped
+    assert 1000 < len(result.tokens) < len(compile_source(source).tokens)
+    assert result.ast.statements == [] and len(result.assembly) == 0
+
+    result = compile_source(source, budget=Budget(max_tac=3000))
+    assert result.stopped.code == "BUD004"
+    assert len(result.ast.statements) == 2000 and 3000 < len(result.tac) < 8000
+    assert len(result.assembly) == 0
+
+    assert compile_source(source, budget=Budget(deadline=0)).stopped.code == "BUD006"
+
+
+def test_diagnostics_storm_is_cut_short():
+    source = error_dense(5000)
+    result = compile_source(source, budget=Budget(max_diagnostics=50))
+    assert result.stopped.code == "BUD005"
+    assert len(result.tokens) * 10 < len(compile_source(source).tokens)
+
+
+def test_cli_budget_flags_report_partial_output(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "big.src"
+    path.write_text(declarations(1000), encoding="utf-8")
+    monkeypatch.setattr(sys, "argv", ["compiler-sim", "all", str(path), "--max-ast-nodes", "100"])
+    assert main() == 0
+    assert "BUD003" in capsys.readouterr().err
+
+
+def test_deep_nesting_is_stopped_while_parsing():
+    source = "int a = " + "(" * 2000 + "1" + ")" * 2000 + ";"
+    result = compile_source(source, budget=Budget(max_nodes=100, deadline=0.5))
+    assert result.stopped.code == "BUD008" and result.stopped.phase == "parser"
+    assert result.ast.statements == []
+
+    chain = "int a = " + " + ".join(["x"] * 5000) + ";"
+    result = compile_source(chain, budget=Budget(max_depth=50))
+    assert result.stopped.code == "BUD008" and len(result.tac) == 0
+
+
+def test_input_without_semicolons_is_checked_while_lexing_and_parsing():
+    source = "int a = 1 " * 200000
+    result = compile_source(source, budget=Budget(max_tokens=1000))
+    assert result.stopped.code == "BUD002"
+    assert 1000 < len(result.tokens) < 100_000  # of 800_000
+
+    source = "int a = " + "+".join(["x"] * 50000)
+    result = compile_source(source, budget=Budget(max_nodes=5000))
+    assert result.stopped.code == "BUD003" and result.stopped.phase == "parser"
+    assert result.stopped.span.offset < len(source) // 2
+
+
+def test_unrelated_budgets_leave_flat_chains_alone():
+    source = "int a = 1; int x = " + "+".join(["a"] * 400) + ";"
+    budgeted = compile_source(source, budget=Budget(max_bytes=10**9))
+    assert budgeted.stopped is None
+    assert budgeted.tac == compile_source(source).tac
+
+    taller = "int a = 1; int x = " + "+".join(["a"] * 5000) + ";"
+    result = compile_source(taller, budget=Budget(deadline=60))
+    assert result.stopped.code == "BUD008" and result.stopped.phase == "semantic"
+
+
+def test_byte_budget_counts_utf8_bytes_of_text():
+    source = "int café = 1;" * 10
+    assert compile_source(source, budget=Budget(max_bytes=140)).stopped is None
+    assert compile_source(source, budget=Budget(max_bytes=139)).stopped.code == "BUD001"
+    encoded = source.encode("utf-8")
+    assert compile_source(encoded, budget=Budget(max_bytes=139)).stopped.code == "BUD001"
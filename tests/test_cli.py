@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+
+
+def test_lex_command_imports_only_lexer_modules(tmp_path):
+    source = tmp_path / "prog.src"
+    source.write_text("int a = 1;", encoding="utf-8")
+    code = (
+        "import sys; from compiler.cli import main; "
+        f"sys.argv = ['compiler-sim', 'lex', {str(source)!r}]; main(); "
+        "print(sorted(m for m in sys.modules if m.startswith('compiler')), file=sys.stderr)"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    loaded = proc.stderr.strip()
+    assert "compiler.lexer" in loaded
+    for module in ("compiler.pipeline", "compiler.codegen", "compiler.parser", "json"):
+        assert f"'{module}'" not in loaded
+
+
+def test_lex_reads_from_a_fifo(tmp_path):
+    fifo = tmp_path / "prog.fifo"
+    os.mkfifo(fifo)
+    code = f"import sys; from compiler.cli import main; sys.argv = ['compiler-sim', 'lex', {str(fifo)!r}]; main()"
+    proc = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE, text=True)
+    with open(fifo, "w", encoding="utf-8") as writer:
+        writer.write("int a = 1;")
+    out, _ = proc.communicate(timeout=30)
+    assert proc.returncode == 0
+    assert "int" in out and "a" in out
+
+
+def test_columns_count_characters_in_mapped_files(tmp_path):
+    source = tmp_path / "prog.src"
+    source.write_text("int café = 1 $ 2;", encoding="utf-8")
+    code = f"import sys; from compiler.cli import main; sys.argv = ['compiler-sim', 'lex', {str(source)!r}]; main()"
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert "(linea 1, col 14)" in proc.stdout
@@ -0,0 +1,58 @@
+from compiler.codegen import LOAD, MULI, STORE, Opcode, Target, generate
+from compiler.lexer import lex
+from compiler.machine import compare_targets, simulate
+from compiler.parser import parse
+from compiler.pipeline import compile_source
+from compiler.tac import generate as generate_tac
+from compiler.tac import is_temp
+
+
+def test_codegen_emits_structured_instructions():
+    tokens, _ = lex("int position = initial + velocity * 60;")
+    program, _ = parse(tokens)
+    asm = generate(generate_tac(program))
+    first = list(asm)[:2]
+    assert first == [(LOAD, 1, asm.names.index("velocity")), (MULI, 1, 60)]
+    assert asm.ops[-1] == STORE and Opcode(asm.ops[-1]).name == "STORE"
+    assert "instructions" not in vars(asm)
+    assert asm.instructions == [
+        "LOAD R1, velocity",
+        "MULI R1, 60",
+        "LOAD R2, initial",
+        "ADD R2, R1",
+        "STORE position, R2",
+    ]
+
+
+def test_shared_temps_are_spilled_before_being_overwritten():
+    tokens, _ = lex("int r = x * 2 * 3 + x * 2; int s = x * 2 + r;")
+    program, _ = parse(tokens, hash_cons=True)
+    tac = generate_tac(program)
+    assert [i.result for i in tac.instructions].count("t1") == 1
+    asm = generate(tac)
+    assert "STORE %t1, R1" in asm.instructions
+    memory = simulate(asm, {"x": 5}).memory
+    assert (memory["r"], memory["s"]) == (40, 50)
+
+
+def test_targets_share_lowering_and_agree_on_results():
+    tokens, _ = lex("int p = i + v * 60; int q = i * v + p;")
+    program, _ = parse(tokens, hash_cons=True)
+    tac = generate_tac(program)
+    risc = generate(tac, target=Target.RISC)
+    stack = generate(tac, target="stack")
+    assert risc.instructions[:2] == ["LOAD R1, v", "MULI R2, R1, 60"]
+    assert stack.instructions[:5] == ["PUSH v", "PUSHI 60", "MUL", "PUSH i", "ADD"]
+    results = compare_targets(tac, memory={"i": 2, "v": 3})
+    memories = [{k: v for k, v in r.memory.items() if not is_temp(k)} for r in results.values()]
+    assert memories[0] == memories[1] == memories[2] == {"i": 2, "v": 3, "p": 182, "q": 188}
+    assert results[Target.RISC].instructions < results[Target.ACCUMULATOR].instructions
+
+
+def test_declared_names_spelled_like_temps_keep_their_own_registers():
+    source = "int t1 = 5; int a = x + 1; int b = t1 + a;"
+    for target in Target:
+        result = compile_source(source, target=target)
+        for asm in (result.assembly, result.optimized_assembly):
+            memory = simulate(asm, {"x": 10}).memory
+            assert (memory["t1"], memory["b"]) == (5, 16)
@@ -0,0 +1,41 @@
+from compiler.codegen import generate
+from compiler.depgraph import build, select
+from compiler.lexer import lex
+from compiler.machine import simulate
+from compiler.parser import parse
+from compiler.tac import generate as generate_tac
+
+SOURCE = (
+    "int a = x * 2; int b = y * 3; int c = z * 4;"
+    "int d = a + 1; int e = b + 1; int f = c + 1; int g = d * e;"
+)
+INPUTS = {"x": 1, "y": 2, "z": 3}
+
+
+def test_graph_levels_groups_and_slices():
+    tokens, _ = lex(SOURCE)
+    program, _ = parse(tokens)
+    graph = build(program)
+    assert graph.deps[6] == (3, 4)
+    assert graph.critical_path() == [0, 3, 6]
+    assert graph.critical_path_length() == 3
+    assert graph.independent_groups() == [[0, 1, 3, 4, 6], [2, 5]]
+    assert graph.slice(["e"]) == [1, 4]
+
+
+def test_schedule_lowers_register_pressure_and_keeps_results():
+    tokens, _ = lex(SOURCE)
+    program, _ = parse(tokens)
+    before = simulate(generate(generate_tac(program)), INPUTS)
+    after = simulate(generate(generate_tac(select(program, schedule=True))), INPUTS)
+    assert after.memory == before.memory
+    assert after.max_live_registers < before.max_live_registers
+
+
+def test_redeclared_names_keep_their_readers_in_order():
+    tokens, _ = lex("int b = a + 1; int a = 5; int c = a * 2; int a = c + b;")
+    program, _ = parse(tokens)
+    graph = build(program)
+    assert graph.preds[1] == (0,)
+    scheduled = simulate(generate(generate_tac(select(program, schedule=True))), {"a": 1})
+    assert scheduled.memory == simulate(generate(generate_tac(program)), {"a": 1}).memory
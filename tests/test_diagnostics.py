@@ -0,0 +1,38 @@
+from compiler.diagnostics import (
+    DiagnosticLimits,
+    DiagnosticSink,
+    Phase,
+    SourceMap,
+    Span,
+    diag,
+)
+from compiler.lexer import lex
+from compiler.pipeline import compile_source
+
+
+def test_sink_coalesces_adjacent_runs_and_caps_per_phase():
+    sink = DiagnosticSink(DiagnosticLimits(per_phase=2, total=10))
+    source = SourceMap("\n" * 40)
+    for line in (1, 2, 3):
+        sink.report(diag(Phase.LEXER, "LEX001", "Unexpected character '$'", Span(line - 1, source)))
+    sink.report(diag(Phase.LEXER, "LEX001", "Unexpected character '$'", Span(8, source)))
+    for col in (1, 2, 3):
+        sink.report(diag(Phase.SEMANTIC, "SEM002", "undeclared", Span(col * 10, source)))
+
+    lexer = sink.finish(Phase.LEXER)
+    ranges = [(d.span.line, d.end and d.end.line, d.count) for d in lexer]
+    assert ranges == [(1, 3, 3), (9, None, 1)]
+    semantic = sink.finish(Phase.SEMANTIC)
+    assert [d.code for d in semantic] == ["SEM002", "SEM002", "DIAG001"]
+    assert semantic[-1].message == "1 more diagnostics suppressed"
+
+
+def test_garbage_input_is_bounded():
+    source = "\n".join(["int x = + ) ( * ;", "$#!%", "; ; ) ("] * 5000)
+    _tokens, lex_diags = lex(source)
+    assert len(lex_diags) == 101
+    assert lex_diags[-1].message == "19600 more diagnostics suppressed"
+
+    result = compile_source(source, limits=DiagnosticLimits(per_phase=20, total=30))
+    assert len(result.diagnostics) <= 32
+    assert result.diagnostics[-1].code == "DIAG001"
@@ -0,0 +1,36 @@
+import pytest
+
+from compiler.interpreter import CompiledTAC, evaluate
+from compiler.optimizer import optimize
+from compiler.pipeline import compile_source
+from compiler.workloads import generate
+
+
+def test_evaluate_with_free_variables():
+    result = compile_source("int position = initial + velocity * 60;")
+    evaluation = evaluate(result.tac, {"initial": 1, "velocity": 2})
+    assert evaluation.values == {"initial": 1, "velocity": 2, "position": 121}
+    assert evaluation.executed == 3
+    with pytest.raises(ValueError):
+        evaluate(result.tac, {"initial": 1})
+
+
+def test_optimize_preserves_semantics_on_generated_programs():
+    for name in ("declarations", "deep_nesting", "wide_chains", "identifier_reuse"):
+        tac = compile_source(generate(name, 40)).tac
+        optimized = optimize(tac).program
+        baseline, after = evaluate(tac), evaluate(optimized)
+        assert baseline.values == after.values, name
+        assert after.executed <= baseline.executed
+
+
+def test_batch_matches_single_evaluation():
+    compiled = CompiledTAC(compile_source("int y = x * x + 3 * x + k;").tac)
+    vectors = [{"x": x, "k": k} for x in range(5) for k in (0, 7)]
+    batch = compiled.evaluate_batch(vectors)
+    assert [e.values for e in batch] == [compiled.evaluate(v).values for v in vectors]
+
+
+def test_temps_and_variables_spelled_alike_get_separate_slots():
+    tac = compile_source("int t1 = 5; int a = x + 1; int b = t1 + a;").tac
+    assert evaluate(tac, {"x": 10}).values == {"t1": 5, "x": 10, "a": 11, "b": 16}
@@ -1,3 +1,5 @@
+import mmap
+
 from compiler.lexer import TokenType, lex
 
 
@@ -17,3 +19,42 @@ def test_lex_tokens():
         TokenType.INTEGER_LITERAL,
         TokenType.SEMICOLON,
     ]
+
+
+def test_spans_resolve_lines_from_offsets():
+    tokens, _ = lex("int a = 1;\n\n  int bb = a;")
+    bb = tokens[6]
+    assert (bb.lexeme, bb.offset) == ("bb", 18)
+    assert (bb.span.line, bb.span.col) == (3, 7)
+    assert (tokens[-1].span.line, tokens[-1].span.col) == (3, 14)
+
+
+def test_mapped_bytes_lex_like_text(tmp_path):
+    source = "int café = 12;\nint b = café * 3 $ 4;"
+    path = tmp_path / "prog.src"
+    path.write_bytes(source.encode("utf-8"))
+    with open(path, "rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        mapped, mapped_diags = lex(mm)
+        text, text_diags = lex(source)
+        assert [(t.type, t.lexeme, t.literal) for t in mapped] == [
+            (t.type, t.lexeme, t.literal) for t in text
+        ]
+        assert [d.code for d in mapped_diags] == [d.code for d in text_diags] == ["LEX001"]
+        assert [(d.span.line, d.span.col) for d in mapped_diags] == [
+            (d.span.line, d.span.col) for d in text_diags
+        ]
+
+
+def test_invalid_utf8_is_reported_where_it_occurs():
+    tokens, diagnostics = lex(b"int a = 1;\nint b\xff = 2;")
+    assert [d.code for d in diagnostics] == ["LEX002"]
+    assert (diagnostics[0].span.line, diagnostics[0].span.col) == (2, 6)
+    assert [t.lexeme for t in tokens if t.type == TokenType.IDENTIFIER] == ["a", "b"]
+
+
+def test_bytes_and_text_accept_the_same_whitespace():
+    source = "int\x1ca =\x1d1\x1e+\x1f2;\x0b\x0c"
+    text, text_diags = lex(source)
+    data, data_diags = lex(source.encode("utf-8"))
+    assert text_diags == data_diags == []
+    assert [(t.type, t.lexeme) for t in data] == [(t.type, t.lexeme) for t in text]
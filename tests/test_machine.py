@@ -0,0 +1,23 @@
+from compiler.interpreter import evaluate
+from compiler.machine import DEFAULT_CYCLES, CostModel, compare, simulate
+from compiler.pipeline import compile_source
+from compiler.workloads import generate
+
+
+def test_simulation_matches_tac_semantics():
+    source = "int p = i + v * 60; int q = i * v + p; int r = v + v * i;"
+    result = compile_source(source)
+    inputs = {"i": 3, "v": 5}
+    expected = evaluate(result.tac, inputs).values
+    for program in (result.assembly, result.optimized_assembly):
+        assert simulate(program, inputs).memory == expected
+
+
+def test_compare_reports_cycles_and_pressure():
+    result = compile_source(generate("identifier_reuse", 10))
+    model = CostModel({**DEFAULT_CYCLES, "MUL": 10})
+    comparison = compare(result, model=model)
+    assert comparison.baseline.cycles > 0
+    assert comparison.optimized.cycles <= comparison.baseline.cycles
+    assert comparison.baseline.memory_reads > 0
+    assert 1 <= comparison.optimized.max_live_registers <= comparison.optimized.registers_used
@@ -0,0 +1,37 @@
+from compiler.lexer import lex
+from compiler.memo import ShapeCache, shape
+from compiler.parser import parse
+from compiler.pipeline import compile_source
+from compiler.tac import generate
+
+SOURCE = "int a = x * 2 + x; int b = y * 7 + y; int c = a + b; int d = (a + 1) * 3;"
+
+
+def test_alpha_renamed_shapes_share_a_template():
+    tokens, _ = lex(SOURCE)
+    program, _ = parse(tokens)
+    keys = [shape(decl.assignment.value)[0] for decl in program.statements]
+    assert keys[0] == keys[1] and keys[2] != keys[0]
+    memo = ShapeCache()
+    assert generate(program, memo=memo) == generate(program)
+    stats = memo.stats()
+    assert (stats.hits, stats.misses, stats.size) == (1, 3, 3)
+
+
+def test_lru_evicts_least_recently_used_shape():
+    memo = ShapeCache(maxsize=2)
+    tokens, _ = lex("int a = x + 1; int b = x * 2; int c = y + 3; int d = (x + y) * 2;")
+    program, _ = parse(tokens)
+    generate(program, memo=memo)
+    stats = memo.stats()
+    assert (stats.hits, stats.evictions, stats.size) == (1, 1, 2)
+    assert stats.hit_rate == 0.25
+
+
+def test_pipeline_reports_memo_counters_for_each_run():
+    memo = ShapeCache()
+    compile_source(SOURCE, memo=memo)
+    result = compile_source(SOURCE, memo=memo)
+    counters = result.metrics.counters
+    assert (counters["memo_hits"], counters["memo_misses"]) == (4, 0)
+    assert counters["memo_hit_rate_pct"] == 100
@@ -0,0 +1,27 @@
+from compiler.pipeline import compile_source
+
+SOURCE = "int initial = 1;int velocity = 2;int position = initial + velocity * 60;"
+
+
+def test_compile_records_phase_metrics():
+    metrics = compile_source(SOURCE).metrics
+    assert [p.name for p in metrics.phases] == [
+        "lexer",
+        "parser",
+        "semantic",
+        "tac",
+        "codegen",
+        "optimizer",
+        "optimized_codegen",
+    ]
+    assert metrics.counters["tokens"] == 19
+    assert metrics.counters["statements"] == 3
+    assert metrics.counters["tac_instructions"] == 5
+    assert metrics.counters["registers"] >= 2
+    assert metrics.profile is None
+
+
+def test_profile_hook_collects_stats():
+    metrics = compile_source(SOURCE, profile=True).metrics
+    assert metrics.profile and "lex" in metrics.profile
+    assert all(p.peak_bytes is not None for p in metrics.phases)
@@ -0,0 +1,85 @@
+import pytest
+
+from compiler import optimizer
+from compiler.interpreter import evaluate
+from compiler.optimizer import optimize
+from compiler.pipeline import compile_source
+from compiler.tac import CONST, OP_ADD, OP_ASSIGN, OP_MUL, TEMP, VAR, TACInstr, TACProgram
+
+
+def test_folds_chains_through_temps_and_variables():
+    program = TACProgram(
+        [
+            TACInstr("*", 2, 3, "t1"),
+            TACInstr("+", "t1", 4, "t2"),
+            TACInstr("ASSIGN", "t2", None, "a"),
+            TACInstr("*", "a", "x", "t3"),
+            TACInstr("ASSIGN", "t3", None, "b"),
+            TACInstr("ASSIGN", "a", None, "total"),
+        ]
+    )
+    result = optimize(program)
+    assert result.program.instructions == [
+        TACInstr("ASSIGN", 10, None, "a"),
+        TACInstr("*", "x", 10, "b"),
+        TACInstr("ASSIGN", 10, None, "total"),
+    ]
+    assert "Constant folding: 6 + 4 -> 10" in result.explanations
+    assert evaluate(result.program, {"x": 7}).values == evaluate(program, {"x": 7}).values
+
+
+def test_batched_folds_keep_exact_values(monkeypatch):
+    monkeypatch.setattr(optimizer, "NUMPY_BATCH_MIN", 2)
+    big = 1 << 40
+    program = TACProgram(
+        [TACInstr("*", big, i + 1, f"t{i + 1}") for i in range(8)]
+        + [TACInstr("ASSIGN", f"t{i + 1}", None, f"v{i}") for i in range(8)]
+    )
+    values = evaluate(optimize(program).program).values
+    assert values == {f"v{i}": big * (i + 1) for i in range(8)}
+
+
+def test_numpy_batch_matches_python_ints():
+    pytest.importorskip("numpy")
+    lefts, rights = list(range(-300, 300)), list(range(600))
+    assert optimizer._fold_numpy("*", lefts, rights) == [x * y for x, y in zip(lefts, rights)]
+    assert optimizer._fold_numpy("+", [1 << 63], [1]) is None
+
+
+def test_numpy_folding_matches_pure_python_folding(monkeypatch):
+    pytest.importorskip("numpy")
+    source = "".join(f"int v{i} = {i} * 3 + {i} * {i};" for i in range(1000))
+    tac = compile_source(source).tac
+    with_numpy = optimize(tac).program
+    monkeypatch.setattr(optimizer, "_numpy", False)
+    assert optimize(tac).program == with_numpy
+
+
+def test_columnar_tac_round_trips_and_is_copied_before_rewriting():
+    program = TACProgram(
+        [
+            TACInstr("+", "x", 2, "t1"),
+            TACInstr("*", "t1", "t1", "t2"),
+            TACInstr("ASSIGN", "t2", None, "y"),
+        ],
+        frozenset({"t1"}),
+    )
+    cols = program.columns
+    assert [op for op, *_ in cols.rows()] == [OP_ADD, OP_MUL, OP_ASSIGN]
+    assert [cols.arg1[0] & 3, cols.arg2[0] & 3, cols.result[0] & 3] == [VAR, CONST, TEMP]
+    assert TACProgram(shared=program.shared, columns=cols) == program
+
+    result = optimize(program)
+    assert len(result.program) == 2 and result.program.instructions[-1].result == "y"
+    assert cols.decode_all() == program.instructions
+
+
+def test_declared_variables_spelled_like_temps_are_kept():
+    result = compile_source("int t5 = 2 + 3; int a = 1; int t1 = a + t5;")
+    assert result.optimized_tac.program.instructions == [
+        TACInstr("ASSIGN", 5, None, "t5"),
+        TACInstr("ASSIGN", 1, None, "a"),
+        TACInstr("ASSIGN", 6, None, "t1"),
+    ]
+    assert result.optimized_assembly.instructions[-1] == "STORE t1, R3"
+    assert evaluate(result.optimized_tac.program).values == {"t5": 5, "a": 1, "t1": 6}
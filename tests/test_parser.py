@@ -16,3 +16,27 @@ def test_parse_declaration_ast():
     assert assign.target.name == "position"
     assert isinstance(assign.value, ast.BinaryExpr)
     assert assign.value.op == ast.BinOp.ADD
+
+
+def test_panic_mode_reports_one_error_per_statement():
+    tokens, _ = lex("int a = (1 + ;\nint b = 2;\n\nint c = ) ) + 3; int d = c;")
+    program, diagnostics = parse(tokens)
+    assert [d.code for d in diagnostics] == ["PAR006", "PAR006"]
+    assert [s.assignment.target.name for s in program.statements] == ["a", "b", "c", "d"]
+
+
+def test_statement_after_missing_type_is_kept():
+    tokens, _ = lex("a = 1;\nint b = 2;")
+    program, diagnostics = parse(tokens)
+    assert [d.code for d in diagnostics] == ["PAR002"]
+    assert [s.assignment.target.name for s in program.statements] == ["b"]
+
+
+def test_hash_consing_shares_subtrees_and_keeps_spans():
+    tokens, _ = lex("int a = v * 60 + 1;\nint b = v * 60;")
+    program, _ = parse(tokens, hash_cons=True)
+    first = program.statements[0].assignment.value
+    second = program.statements[1].assignment.value
+    assert first.left is second
+    spans = program.span_table.spans(second)
+    assert [(s.line, s.col) for s in spans] == [(1, 11), (2, 11)]
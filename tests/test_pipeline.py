@@ -1,4 +1,19 @@
-from compiler.pipeline import compile_source
+from queue import Queue
+
+import pytest
+
+from compiler.machine import simulate
+from compiler.memo import ShapeCache
+from compiler.pipeline import (
+    _drain,
+    _Stage,
+    compile_many,
+    compile_many_threaded,
+    compile_pipelined,
+    compile_source,
+)
+from compiler.tac import temp_key
+from compiler.workloads import WORKLOADS, declarations, error_dense
 
 
 def test_pipeline_outputs():
@@ -12,3 +27,73 @@ def test_pipeline_outputs():
     assert len(result.tac.instructions) >= 3
     assert len(result.assembly.instructions) >= 3
     assert len(result.optimized_assembly.instructions) >= 3
+
+
+def test_hash_consing_preserves_results_and_diagnostics():
+    source = "int a = 2; int r = (a + k) * (a + k); int s = (a + k) * 3; int k = 1;"
+    plain = compile_source(source)
+    shared = compile_source(source, hash_cons=True)
+    assert len(shared.tac.instructions) < len(plain.tac.instructions)
+    assert [(d.code, d.span.col) for d in shared.diagnostics] == [
+        (d.code, d.span.col) for d in plain.diagnostics
+    ]
+    spilled = simulate(shared.assembly, {"k": 3}).memory
+    assert "%t1" in spilled
+    assert {k: v for k, v in spilled.items() if k != temp_key("t1")} == simulate(
+        plain.assembly, {"k": 3}
+    ).memory
+
+
+@pytest.mark.parametrize("source", [declarations(60), error_dense(60).encode()])
+def test_pipelined_matches_sequential(source):
+    expected = compile_source(source, target="risc")
+    result = compile_pipelined(source, target="risc", batch=3, queue_size=1)
+    assert result.tokens == expected.tokens
+    assert result.ast.statements == expected.ast.statements
+    assert result.tac == expected.tac
+    assert result.assembly.instructions == expected.assembly.instructions
+    assert result.optimized_tac.program == expected.optimized_tac.program
+    assert result.optimized_tac.explanations == expected.optimized_tac.explanations
+    assert result.optimized_assembly.instructions == expected.optimized_assembly.instructions
+    assert result.diagnostics == expected.diagnostics
+    assert result.metrics.counters == expected.metrics.counters
+
+
+def test_pipelined_stage_error_is_raised():
+    class Broken(ShapeCache):
+        def lower(self, *args):
+            raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        compile_pipelined(declarations(50), memo=Broken(), batch=1, queue_size=1)
+
+
+def test_pipelined_stage_closes_its_outboxes_when_its_input_fails():
+    def items():
+        yield 1
+        raise RuntimeError("input")
+
+    outbox: Queue = Queue()
+    stage = _Stage("lexer", lambda item: item + 1, items(), [outbox])
+    stage.run()
+    assert isinstance(stage.error, RuntimeError)
+    assert list(_drain(outbox)) == [2]
+
+
+def test_threaded_compiles_share_a_memo_safely():
+    sources = [make(40) for make in WORKLOADS.values()] * 4
+    expected = [compile_source(source) for source in sources]
+    memo = ShapeCache(4)
+    results = compile_many_threaded(sources, workers=8, memo=memo)
+    assert [r.assembly.instructions for r in results] == [r.assembly.instructions for r in expected]
+    assert [r.diagnostics for r in results] == [r.diagnostics for r in expected]
+    stats = memo.stats()
+    assert stats.hits + stats.misses == sum(r.metrics.counters["statements"] for r in results)
+
+
+def test_process_pool_matches_sequential():
+    sources = [declarations(30), error_dense(30)]
+    results = compile_many(sources, workers=2)
+    assert [r.tac for r in results] == [compile_source(source).tac for source in sources]
+    with pytest.raises(ValueError):
+        compile_many(sources, memo=ShapeCache())
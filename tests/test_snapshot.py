@@ -0,0 +1,79 @@
+from compiler.machine import simulate
+from compiler.pipeline import compile_source
+from compiler.snapshot import LAYER_LIMIT, Layer, Snapshot, resume, take_snapshot
+
+BASE = "int a = x * 2; int b = a + y;"
+SNIPPET = "int c = a * b; int d = c + a;"
+INPUTS = {"x": 3, "y": 4}
+
+
+def test_resumed_snippet_matches_whole_program():
+    base = take_snapshot(BASE)
+    result = resume(base, SNIPPET)
+    whole = compile_source(BASE + SNIPPET)
+    compacted = result.snapshot.compact()
+    assert compacted.tac == whole.tac.instructions
+    assert compacted.assembly.instructions == whole.assembly.instructions
+    assert simulate(compacted.assembly, INPUTS).memory == simulate(whole.assembly, INPUTS).memory
+
+
+def test_resume_reports_against_base_symbols_without_mutating_base():
+    base = take_snapshot(BASE)
+    registers, regmap = base.registers, dict(base.regmap)
+    holders = {reg: list(names) for reg, names in base.holders.items()}
+    result = resume(base, "int a = 1; int e = missing + b;")
+    assert [d.code for d in result.diagnostics] == ["SEM001", "SEM002"]
+    assert result.tac.instructions[1].result == "t3"
+    assert result.assembly.instructions[:2] == ["LOADI R3, 1", "STORE a, R3"]
+    assert base.symbols.lookup("e") is None
+    assert (base.registers, base.regmap, base.holders) == (registers, regmap, holders)
+
+
+def test_snapshot_round_trips_through_a_file(tmp_path):
+    path = tmp_path / "base.json"
+    resume(take_snapshot(BASE), "int c = a * b;").snapshot.save(str(path))
+    loaded = Snapshot.load(str(path))
+    result = resume(loaded, "int d = c + a;")
+    whole = compile_source(BASE + SNIPPET)
+    assert result.snapshot.compact().assembly.instructions == whole.assembly.instructions
+    assert loaded.symbols.lookup("a").span.line == 1
+
+
+def test_resumed_state_iterates_over_the_base_entries():
+    snapshot = resume(resume(take_snapshot(BASE), "int c = a * b;").snapshot, SNIPPET[15:]).snapshot
+    whole = take_snapshot(BASE + SNIPPET)
+    assert len(snapshot.regmap) == len(whole.regmap) and sorted(snapshot.regmap) == sorted(
+        whole.regmap
+    )
+    assert dict(snapshot.regmap.items()) == whole.regmap
+    assert {reg: list(names) for reg, names in snapshot.holders.items()} == whole.holders
+
+
+def test_long_resume_chains_stay_shallow():
+    snapshot = take_snapshot(BASE)
+    lines = [BASE]
+    for k in range(2000):
+        line = f"int v{k} = a + {k};"
+        snapshot = resume(snapshot, line).snapshot
+        lines.append(line)
+    assert snapshot.layers <= LAYER_LIMIT
+    assert snapshot.symbols.lookup("a") is not None
+    whole = compile_source("".join(lines))
+    compacted = snapshot.compact()
+    assert compacted.assembly.instructions == whole.assembly.instructions
+    assert Snapshot.from_dict(snapshot.to_dict()).temps == snapshot.temps
+
+
+def test_squashing_reuses_the_root_state():
+    root = take_snapshot(BASE)
+    snapshot = root
+    for k in range(3 * LAYER_LIMIT):
+        snapshot = resume(snapshot, f"int v{k} = a + {k};").snapshot
+    regmap = snapshot.regmap
+    while isinstance(regmap, Layer):
+        regmap = regmap.base
+    assert regmap is root.regmap
+    symbols = snapshot.symbols
+    while symbols.parent is not None:
+        symbols = symbols.parent
+    assert symbols is root.symbols
@@ -0,0 +1,31 @@
+from compiler.lexer import lex
+from compiler.parser import parse
+from compiler.visualize import ELISION, RenderOptions, build_graph, render
+
+
+def test_node_budget_bounds_output():
+    tokens, _ = lex("".join(f"int v{i} = {i} + {i} * 2;" for i in range(1000)))
+    program, _ = parse(tokens)
+    graph = build_graph(program, RenderOptions(max_nodes=50))
+    assert len(graph.labels) < 60
+    assert graph.labels[graph.children[graph.roots[0]][-1]].startswith(ELISION)
+    assert render(program, "dot", RenderOptions(max_nodes=50)).startswith("digraph AST {")
+
+
+def test_dedup_shares_identical_subtrees():
+    tokens, _ = lex("int a = x * 60; int b = x * 60;")
+    program, _ = parse(tokens)
+    graph = build_graph(program, RenderOptions(dedup=True, subgraphs=True))
+    assert graph.labels.count("Expr(*)") == 1
+    assert len(graph.groups) == 2
+    text = render(program, "text", RenderOptions(dedup=True, max_depth=2))
+    assert ELISION in text
+
+
+def test_long_left_leaning_chain_stays_within_budget():
+    tokens, _ = lex("int a = " + " + ".join(["x"] * 5000) + ";")
+    program, _ = parse(tokens)
+    graph = build_graph(program, RenderOptions(max_nodes=50))
+    assert len(graph.labels) <= 50 + 5
+    assert graph.elided == 1
+    assert len(build_graph(program).labels) == 2 * 5000 + 3
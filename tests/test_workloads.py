@@ -0,0 +1,17 @@
+from compiler.pipeline import compile_source
+from compiler.workloads import WORKLOADS, generate
+
+
+def test_clean_workloads_compile_without_diagnostics():
+    for name in WORKLOADS:
+        if name == "error_dense":
+            continue
+        result = compile_source(generate(name, 20))
+        assert result.diagnostics == [], name
+        assert len(result.ast.statements) >= 20
+
+
+def test_error_dense_workload_reports_diagnostics():
+    result = compile_source(generate("error_dense", 16))
+    codes = {d.code for d in result.diagnostics}
+    assert {"LEX001", "PAR002", "SEM002"} <= codes